@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Benchmark serial versus parallel batch generation of all schema.org classes
+
+    python benchmarks/batch.py --schemaver 12.0 --jobs 4
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import sys
+import time
+import logging
+import filecmp
+import argparse
+import tempfile
+import multiprocessing
+
+# Use the profilegenerator of this checkout, as importtime.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profilegenerator import schemaorg
+from profilegenerator.main import generate_batch
+from profilegenerator.profileTemplate import versionDateNow
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--schemaver", "-s", metavar="VERSION", default="latest",
+        help='schema.org version, e.g. 10.0 (default: "latest")')
+    parser.add_argument("--jobs", "-j", metavar="N", type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of worker processes (default: %(default)s)")
+    parser.add_argument("--subclasses-of", "-c", metavar="TYPE", default="Thing",
+        help='Generate profiles for TYPE and all subclasses (default: %(default)s)')
+    return parser.parse_args(args)
+
+def run(schematypes, outputDir, jobs, versionDate):
+    start = time.perf_counter()
+    results = generate_batch(schematypes, outputDir, True, jobs, versionDate)
+    seconds = time.perf_counter() - start
+    failed = [r for r in results if r.error]
+    print("jobs=%-3d %5d profiles %3d failed %8.2fs" %
+        (jobs, len(results), len(failed), seconds))
+    return seconds
+
+def main(args=None):
+    args = parse_args(args)
+    logging.basicConfig(level=logging.ERROR)
+    schemaorg.set_version(args.schemaver)
+    schematypes = [str(c) for c in schemaorg.find_subclasses(args.subclasses_of)]
+    versionDate = versionDateNow()
+    with tempfile.TemporaryDirectory() as serialDir, \
+         tempfile.TemporaryDirectory() as parallelDir:
+        serial = run(schematypes, serialDir, 1, versionDate)
+        parallel = run(schematypes, parallelDir, args.jobs, versionDate)
+        names = sorted(os.listdir(serialDir))
+        (match, mismatch, errors) = filecmp.cmpfiles(serialDir, parallelDir,
+            names, shallow=False)
+        print("speed-up x%.2f, %d identical, %d different" %
+            (serial / parallel, len(match), len(mismatch) + len(errors)))
+    return 1 if mismatch or errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
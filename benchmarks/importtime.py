@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Check CLI startup stays fast, failing if over budget or if heavy modules load
+
+    python benchmarks/importtime.py --budget-ms 100
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+# Only needed when parsing/downloading schema.org, rendering or --jobs N
+HEAVY_MODULES = ("rdflib", "urllib.request", "asyncio", "yaml", "multiprocessing")
+
+# Run the CLI, then report which heavy modules were imported, even on
+# the SystemExit from --help/--version
+SCRIPT = """
+import sys, atexit
+atexit.register(lambda: sys.stderr.write("HEAVY %%s\\n" %%
+    " ".join(m for m in %r if m in sys.modules)))
+from profilegenerator.main import main
+sys.exit(main(%r))
+"""
+
+IMPORTTIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)")
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", metavar="MS", type=float, default=100,
+        help="Maximum import time of profilegenerator.main (default: %(default)s)")
+    parser.add_argument("--repeat", "-r", metavar="N", type=int, default=5,
+        help="Runs per command, the fastest is reported (default: %(default)s)")
+    return parser.parse_args(args)
+
+def run(cliArgs):
+    """Run CLI once, returning (wall seconds, import microseconds, heavy modules)"""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+        SCRIPT % (HEAVY_MODULES, cliArgs)], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    seconds = time.perf_counter() - start
+    importUs = 0
+    heavy = []
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME.match(line)
+        if m and m.group(2) == "profilegenerator.main":
+            importUs = int(m.group(1))
+        elif line.startswith("HEAVY "):
+            heavy = line.split()[1:]
+    return (seconds, importUs, heavy)
+
+def main(args=None):
+    args = parse_args(args)
+    failed = False
+    for cliArgs in (["--help"], ["--version"], ["batch", "--help"]):
+        runs = [run(cliArgs) for i in range(args.repeat)]
+        (seconds, importUs, heavy) = min(runs)
+        importMs = min(r[1] for r in runs) / 1000
+        print("%-16s %7.1f ms wall %7.1f ms import  %s" % (" ".join(cliArgs),
+            seconds*1000, importMs, heavy and "imported " + " ".join(heavy) or ""))
+        if heavy or importMs > args.budget_ms:
+            failed = True
+    if failed:
+        print("FAILED: over %s ms budget or heavy modules imported" % args.budget_ms)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Compare memory of the schema.org term table with one class per term
+
+    python benchmarks/memory.py
+
+Measures the Python memory retained (with tracemalloc) by a schema.org
+vocabulary loaded from the cache and by creating its SchemaClass and
+SchemaProperty types, for the id table with SchemaType views (unpickled,
+and memory-mapped from a snapshot as by the cache) and for a
+reconstruction of the earlier representation: dicts keyed by URI and
+a class created by a SchemaType metaclass per term. Uses the bundled
+schema.org snapshot of benchmarks/suite.py.
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import gc
+import os
+import sys
+import gzip
+import pickle
+import tempfile
+import logging
+import argparse
+import tracemalloc
+from collections import OrderedDict, defaultdict
+
+# Use the profilegenerator of this checkout, as importtime.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profilegenerator import vocabulary, snapshot
+from profilegenerator.vocabulary import SCHEMA, RDF, RDFS
+from profilegenerator.schemaorg import SchemaContext, _topological
+
+from suite import SNAPSHOT, SNAPSHOT_URL
+
+class DictVocabulary:
+    """Earlier Vocabulary index: plain dicts keyed by URI"""
+    def __init__(self, version):
+        self.version = version
+        self.classes = set()
+        self.properties = set()
+        self.labels = {}
+        self.comments = {}
+        self.supertypes = {}
+        self.domainIncludes = {}
+        self.rangeIncludes = {}
+        self.includedInDomainOf = {}
+        self.includedInRangeOf = {}
+
+    @classmethod
+    def from_triples(cls, triples, version):
+        vocab = cls(version)
+        related = {"supertypes": {}, "domainIncludes": {}, "rangeIncludes": {}}
+        for (s, p, o) in triples:
+            s, p, o = str(s), str(p), str(o)
+            if p == RDF.type:
+                if o == RDFS.Class:
+                    vocab.classes.add(s)
+                elif o == RDF.Property:
+                    vocab.properties.add(s)
+            elif p == RDFS.label:
+                vocab.labels.setdefault(s, o)
+            elif p == RDFS.comment:
+                vocab.comments.setdefault(s, o)
+            elif p == RDFS.subClassOf or p == RDFS.subPropertyOf:
+                related["supertypes"].setdefault(s, set()).add(o)
+            elif p == SCHEMA.domainIncludes:
+                related["domainIncludes"].setdefault(s, set()).add(o)
+            elif p == SCHEMA.rangeIncludes:
+                related["rangeIncludes"].setdefault(s, set()).add(o)
+        for (name, mapping) in related.items():
+            setattr(vocab, name, {s: tuple(sorted(o)) for (s, o) in mapping.items()})
+        vocab.includedInDomainOf = vocab._reverse(vocab.domainIncludes)
+        vocab.includedInRangeOf = vocab._reverse(vocab.rangeIncludes)
+        return vocab
+
+    def _reverse(self, mapping):
+        reverse = {}
+        for (prop, classes) in mapping.items():
+            for c in classes:
+                reverse.setdefault(c, []).append(prop)
+        key = lambda p: self.labels.get(p) or p
+        return {c: tuple(sorted(props, key=key)) for (c, props) in reverse.items()}
+
+class ClassPerTerm(type):
+    """Earlier SchemaType metaclass, without its methods"""
+
+def class_per_term(vocab: DictVocabulary):
+    """Create a class per term and their ancestors, as the earlier SchemaContext"""
+    uri2type = {}
+    ancestors = {}
+    supertypes = defaultdict(tuple, vocab.supertypes)
+    for uri in _topological(sorted(vocab.classes | vocab.properties), supertypes):
+        bases = [uri2type[sup] for sup in supertypes[uri]]
+        bases = tuple(b for b in bases
+            if not any(o is not b and issubclass(o, b) for o in bases))
+        C = uri2type[uri] = ClassPerTerm(uri, bases, {"uri": uri, "context": vocab})
+        ancestors[uri] = tuple(p for p in C.mro() if isinstance(p, ClassPerTerm))
+    return (uri2type, ancestors)
+
+def id_table_views(vocab: vocabulary.Vocabulary):
+    context = SchemaContext(vocab)
+    context.materialize()
+    return context
+
+def retained(build, *args):
+    """Bytes still allocated after build(*args), and its result"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build(*args)
+        gc.collect()
+        (current, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (current, result)
+
+def unpickled(vocab):
+    """Load vocab as from a pickle, like the earlier cache"""
+    return (pickle.loads, pickle.dumps(vocab, protocol=pickle.HIGHEST_PROTOCOL))
+
+def mapped(vocab, directory):
+    """Load vocab as from a snapshot, like the cache"""
+    path = os.path.join(directory, "12.0.vocab")
+    with open(path, "wb") as f:
+        snapshot.write(vocab, f)
+    return (snapshot.load, path)
+
+def measure(load, materialize):
+    """Retained bytes of a vocabulary loaded with load, a (function,
+    argument) tuple, and of creating its types with materialize"""
+    (vocabBytes, vocab) = retained(*load)
+    (typeBytes, types) = retained(materialize, vocab)
+    return OrderedDict([("vocabulary", vocabBytes), ("types", typeBytes),
+        ("total", vocabBytes + typeBytes)])
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    return parser.parse_args(args)
+
+def main(args=None):
+    args = parse_args(args)
+    logging.basicConfig(level=logging.ERROR)
+    with gzip.open(SNAPSHOT) as f:
+        content = f.read()
+    (graph, version) = vocabulary.find_graph(
+        vocabulary.parse_dataset(content, SNAPSHOT_URL), SNAPSHOT_URL)
+    triples = list(vocabulary.declarations(graph))
+    del graph
+
+    results = OrderedDict()
+    dicts = DictVocabulary.from_triples(triples, "12.0")
+    results["class per term"] = measure(unpickled(dicts), class_per_term)
+    table = vocabulary.Vocabulary.from_triples(triples, "12.0")
+    results["id table"] = measure(unpickled(table), id_table_views)
+    with tempfile.TemporaryDirectory() as directory:
+        # Mapped pages are shared between processes, and not counted
+        results["mapped snapshot"] = measure(mapped(table, directory), id_table_views)
+    print("%-16s %14s %14s %14s" % ("", "vocabulary KiB", "types KiB", "total KiB"))
+    for (name, r) in results.items():
+        print("%-16s %14.1f %14.1f %14.1f" % (name, r["vocabulary"] / 1024,
+            r["types"] / 1024, r["total"] / 1024))
+    before = results["class per term"]["total"]
+    for name in list(results)[1:]:
+        print("%s uses x%.2f the memory" % (name, results[name]["total"] / before))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
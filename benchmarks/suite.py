@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Benchmark vocabulary loading, lookups and profile generation offline
+
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --output after.json --compare before.json
+
+Uses the bundled schema.org 12.0 snapshot in benchmarks/data
+(schema.org is licensed under CC BY-SA 3.0). Each case is timed
+--repeat times (fastest and median wall time are recorded, fast cases
+are looped for a stable sample), then run
+once more under tracemalloc for its peak Python memory. With --compare,
+exits 1 if any case is --threshold slower or larger than the baseline.
+Also exits 1 if reading the snapshot directly (rather than with rdflib)
+gives a different vocabulary index, or if profiles are written
+differently than by PyYAML.
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import gc
+import os
+import sys
+import gzip
+import json
+import time
+import logging
+import argparse
+import itertools
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from collections import OrderedDict
+
+# Use the profilegenerator of this checkout, as importtime.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profilegenerator import schemaorg, vocabulary, snapshot
+from profilegenerator._version import __version__
+from profilegenerator.schemaorg import SchemaContext
+from profilegenerator import emitter
+from profilegenerator.main import generate, renderProfile
+
+SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    "data", "schemaorg-all-http-12.0.jsonld.gz")
+SNAPSHOT_URL = vocabulary.SCHEMA_URL.substitute(version="12.0")
+
+# Small to very wide types
+TYPES = ("Dataset", "CreativeWork", "Thing")
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", "-r", metavar="N", type=int, default=5,
+        help="Timed runs per case (default: %(default)s)")
+    parser.add_argument("--output", "-o", metavar="FILE", default=None,
+        help="Write results as JSON to FILE")
+    parser.add_argument("--compare", metavar="FILE", default=None,
+        help="Compare against results in FILE from an earlier run")
+    parser.add_argument("--threshold", metavar="FRACTION", type=float, default=0.2,
+        help="Allowed slowdown/memory growth against --compare (default: %(default)s)")
+    parser.add_argument("--min-seconds", metavar="SECONDS", type=float, default=0.001,
+        help="Ignore slowdowns smaller than SECONDS, as timer noise (default: %(default)s)")
+    parser.add_argument("--min-bytes", metavar="BYTES", type=int, default=65536,
+        help="Ignore memory growth smaller than BYTES (default: %(default)s)")
+    parser.add_argument("--case", "-k", metavar="NAME", action="append",
+        help="Only run cases starting with NAME, can be repeated")
+    return parser.parse_args(args)
+
+def cases(content, dataset, graph, vocab, outputDir):
+    """Benchmark cases as name: (setup, run) where setup() returns
+    the arguments for run(), so it is not timed"""
+    fresh = lambda: (SchemaContext(vocab),)
+    c = OrderedDict()
+    c["parse_dataset"] = (lambda: (content,),
+        lambda content: vocabulary.parse_dataset(content, SNAPSHOT_URL))
+    c["find_graph"] = (lambda: (dataset,),
+        lambda dataset: vocabulary.find_graph(dataset, SNAPSHOT_URL))
+    c["index_vocabulary"] = (lambda: (graph,), lambda graph:
+        vocabulary.Vocabulary.from_triples(vocabulary.declarations(graph), "12.0"))
+    # Instead of the three above
+    c["read_release"] = (lambda: (content,),
+        lambda content: vocabulary.release_declarations(content, SNAPSHOT_URL))
+    c["parse_release"] = (lambda: (content,),
+        lambda content: vocabulary.parse(content, SNAPSHOT_URL))
+    snapshotPath = os.path.join(outputDir, "12.0.vocab")
+    with open(snapshotPath, "wb") as f:
+        snapshot.write(vocab, f)
+    c["cache_load"] = (lambda: (snapshotPath,), snapshot.load)
+    for t in TYPES:
+        c["find_properties[%s]" % t] = (fresh,
+            lambda context, t=t: schemaorg.find_properties(t, context))
+    # As when loaded from the cache
+    mapped = lambda: (SchemaContext(snapshot.load(snapshotPath)),)
+    for t in TYPES:
+        c["find_properties_mapped[%s]" % t] = (mapped,
+            lambda context, t=t: schemaorg.find_properties(t, context))
+    c["materialize"] = (fresh, lambda context: context.materialize())
+    c["reachability"] = (fresh, lambda context: context.reachability)
+    for t in TYPES:
+        c["find_subclasses[%s]" % t] = (fresh,
+            lambda context, t=t: schemaorg.find_subclasses(t, context))
+    # Repeated lookups once the types are created
+    warm = SchemaContext(vocab)
+    warm.materialize()
+    for t in TYPES:
+        c["find_properties_warm[%s]" % t] = (lambda: (warm,),
+            lambda context, t=t: schemaorg.find_properties(t, context))
+    c["inherited_warm"] = (lambda: (warm,), _inherited)
+    c["example_categories"] = (lambda: (warm.reachability,), schemaorg._example_categories)
+    for t in TYPES:
+        c["make_example_class[%s]" % t] = (fresh,
+            lambda context, t=t: schemaorg.make_examples(t, context))
+    # A new file each run, as profiles with unchanged content are not written
+    runs = itertools.count()
+    for t in TYPES:
+        c["generate[%s]" % t] = (fresh, lambda context, t=t:
+            generate(t, filename=os.path.join(outputDir, "%s-%d.html" % (t, next(runs))),
+                overwrite=True, context=context))
+    for t in TYPES:
+        c["generate_mapped[%s]" % t] = (mapped, lambda context, t=t:
+            generate(t, filename=os.path.join(outputDir, "%s-%d.html" % (t, next(runs))),
+                overwrite=True, context=context))
+    return c
+
+def _inherited(context):
+    vocab = context.vocabulary
+    for (uri, kind) in zip(vocab.uris, vocab.kinds):
+        if kind & vocab.CLASS:
+            c = schemaorg.SchemaClass.as_type(uri, context)
+            c.includedInDomainOfWithSuper()
+            c.includedInRangeOfWithSuper()
+        elif kind & vocab.PROPERTY:
+            p = schemaorg.SchemaProperty.as_type(uri, context)
+            p.domainIncludesWithSuper()
+            p.rangeIncludesWithSuper()
+
+def measure(setup, run, repeat, minSample=0.05):
+    """Time run() repeat times, looping fast cases so each sample
+    takes at least minSample seconds, then measure its peak memory"""
+    number = 1
+    times = []
+    while len(times) < repeat:
+        argsList = [setup() for i in range(number)]
+        # Free earlier runs (SchemaType views and their context are cyclic)
+        gc.collect()
+        start = time.perf_counter()
+        for args in argsList:
+            run(*args)
+        seconds = time.perf_counter() - start
+        del argsList
+        if seconds < minSample and not times and number < 1000:
+            number *= 10
+            continue
+        times.append(seconds / number)
+    args = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(*args)
+        (current, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return OrderedDict([("seconds", min(times)),
+        ("median_seconds", statistics.median(times)),
+        ("number", number),
+        ("peak_bytes", peak)])
+
+def pyyaml_profile(schematype, context, versionDate):
+    """Profile of schematype rendered by PyYAML rather than the emitter"""
+    (dump, emitter.dump) = (emitter.dump, emitter.pyyaml_dump)
+    try:
+        return renderProfile(schematype, versionDate=versionDate, context=context)
+    finally:
+        emitter.dump = dump
+
+def compare(results, baseline, threshold, minSeconds, minBytes):
+    """Print changes from baseline, returning names of regressed cases"""
+    regressed = []
+    for (name, r) in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        slower = r["seconds"] / max(b["seconds"], 1e-9)
+        larger = r["peak_bytes"] / max(b["peak_bytes"], 1)
+        flag = ((larger > 1 + threshold and r["peak_bytes"] - b["peak_bytes"] > minBytes) or 
+            (slower > 1 + threshold and r["seconds"] - b["seconds"] > minSeconds))
+        if flag:
+            regressed.append(name)
+        print("%-36s time x%5.2f  memory x%5.2f  %s" %
+            (name, slower, larger, flag and "REGRESSION" or ""))
+    return regressed
+
+def main(args=None):
+    args = parse_args(args)
+    logging.basicConfig(level=logging.ERROR)
+    with gzip.open(SNAPSHOT) as f:
+        content = f.read()
+    # Inputs for the later stages, so each stage is measured alone
+    dataset = vocabulary.parse_dataset(content, SNAPSHOT_URL)
+    (graph, version) = vocabulary.find_graph(dataset, SNAPSHOT_URL)
+    vocab = vocabulary.Vocabulary.from_triples(vocabulary.declarations(graph), "12.0")
+    # rdflib is the reference for reading releases directly
+    direct = vocabulary.parse(content, SNAPSHOT_URL)
+    direct.version = vocab.version
+    if direct.__getstate__() != vocab.__getstate__():
+        print("Reading %s directly gives a different index than rdflib" % SNAPSHOT)
+        return 1
+    # PyYAML is the reference for writing profiles directly
+    context = SchemaContext(vocab)
+    for t in TYPES:
+        if (renderProfile(t, versionDate="20201008T000000", context=context) !=
+                pyyaml_profile(t, context, "20201008T000000")):
+            print("The profile of %s is written differently than by PyYAML" % t)
+            return 1
+
+    results = OrderedDict()
+    with tempfile.TemporaryDirectory() as outputDir:
+        for (name, (setup, run)) in cases(content, dataset, graph, vocab, outputDir).items():
+            if args.case and not any(name.startswith(k) for k in args.case):
+                continue
+            r = results[name] = measure(setup, run, args.repeat)
+            print("%-36s %10.3f ms (median %10.3f ms) %10.1f KiB peak" % (name,
+                r["seconds"]*1000, r["median_seconds"]*1000, r["peak_bytes"] / 1024))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(OrderedDict([
+                ("profilegenerator", __version__),
+                ("python", platform.python_version()),
+                ("platform", platform.platform()),
+                ("repeat", args.repeat),
+                ("results", results)]), f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressed = compare(results, baseline, args.threshold, args.min_seconds, args.min_bytes)
+        if regressed:
+            print("%d regressions over %d%%: %s" % (len(regressed),
+                args.threshold * 100, " ".join(regressed)))
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
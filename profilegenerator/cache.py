@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Local on-disk cache of parsed schema.org vocabularies, as memory-mapped snapshots
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import json
+import errno
+import shutil
+import hashlib
+import argparse
+import datetime
+import logging
+import tempfile
+
+_logger = logging.getLogger(__name__)
+
+# Bump when the layout or payload of a cache entry changes
+CACHE_FORMAT = 4
+METADATA_FILE = "cache.json"
+# Downloaded JSON-LD, until parsed and stored
+DOWNLOAD_FILE = "download.jsonld"
+
+_cache_dir = None
+
+class CacheMiss(FileNotFoundError):
+    """Requested schema.org version is not in the local cache"""
+
+def default_cache_dir():
+    """Cache directory from $BIOSCHEMAS_CACHE, or under $XDG_CACHE_HOME"""
+    if os.environ.get("BIOSCHEMAS_CACHE"):
+        return os.environ["BIOSCHEMAS_CACHE"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "bioschemas-profilegen")
+
+def cache_dir():
+    return _cache_dir or default_cache_dir()
+
+def set_cache_dir(path):
+    global _cache_dir
+    _cache_dir = path
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def _version_dir(schemaver):
+    # schemaver is e.g. "10.0" or "latest", but keep it a single path segment
+    # within the cache, never "..", "." or hidden
+    safe = "".join(c if c.isalnum() or c in "._-" else "_" for c in schemaver)
+    if not safe or safe.startswith("."):
+        raise ValueError("Invalid schema.org version: %r" % schemaver)
+    return os.path.join(cache_dir(), safe)
+
+def _cached_versions():
+    # Names of the folders in cache_dir() that are cache entries,
+    # including those lookup() ignores, e.g. in an old format
+    if not os.path.isdir(cache_dir()):
+        return []
+    return [name for name in sorted(os.listdir(cache_dir()))
+        if name[:1] not in ("", ".") and
+            os.path.isfile(os.path.join(cache_dir(), name, METADATA_FILE))]
+
+def lookup(schemaver):
+    """Return cache metadata for schemaver, or None if not cached"""
+    path = os.path.join(_version_dir(schemaver), METADATA_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        _logger.warning("Ignoring corrupt cache metadata %s: %s" % (path, e))
+        return None
+    if meta.get("format") != CACHE_FORMAT:
+        _logger.info("Ignoring cache of schema.org %s in old format %s" %
+            (schemaver, meta.get("format")))
+        return None
+    if not os.path.exists(payload_path(meta)):
+        _logger.warning("Cache of schema.org %s is missing %s" %
+            (schemaver, meta["payload"]))
+        return None
+    return meta
+
+def payload_path(meta):
+    return os.path.join(_version_dir(meta["schemaver"]), meta["payload"])
+
+def download_path(schemaver):
+    """Where to download schemaver to, kept if interrupted so it can be resumed"""
+    return os.path.join(_version_dir(schemaver), DOWNLOAD_FILE)
+
+def load(schemaver):
+    """Load cached Vocabulary for schemaver, or None if not cached"""
+    meta = lookup(schemaver)
+    if not meta:
+        _logger.debug("schema.org %s not in cache %s" % (schemaver, cache_dir()))
+        return None
+    from . import snapshot
+    path = payload_path(meta)
+    _logger.info("Loading cached schema.org %s from %s" % (schemaver, path))
+    try:
+        return snapshot.load(path)
+    except ValueError as e:
+        _logger.warning("Ignoring corrupt cache: %s" % e)
+        return None
+
+def _write_atomic(path, write, binary=False):
+    # Unique, so processes storing the same version concurrently
+    # do not write to the same temporary file
+    (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(path),
+        prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with (open(fd, "wb") if binary else open(fd, "w", encoding="utf-8")) as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def store(schemaver, url, content: bytes, vocabulary, etag=None, last_modified=None):
+    """Store Vocabulary index of the downloaded content in the cache.
+
+    The payload is keyed by the SHA-256 of the downloaded JSON-LD so that
+    a changed release (e.g. of "latest") replaces, rather than mixes with,
+    the previous entry. etag and last_modified of the HTTP response are
+    kept to revalidate the entry.
+    """
+    from . import snapshot
+    digest = content_hash(content)
+    folder = _version_dir(schemaver)
+    os.makedirs(folder, exist_ok=True)
+    payload = digest + ".vocab"
+    _write_atomic(os.path.join(folder, payload),
+        lambda f: snapshot.write(vocabulary, f), binary=True)
+    meta = {
+        "format": CACHE_FORMAT,
+        "schemaver": schemaver,
+        "url": url,
+        "sha256": digest,
+        "payload": payload,
+        "version": vocabulary.version,
+        "etag": etag,
+        "last_modified": last_modified,
+        "created": datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }
+    _write_atomic(os.path.join(folder, METADATA_FILE),
+        lambda f: json.dump(meta, f, indent=2))
+    # Remove payloads of previous content and the downloaded JSON-LD,
+    # but not the temporary files of other processes storing this version
+    for name in os.listdir(folder):
+        if name not in (payload, METADATA_FILE) and not name.startswith("."):
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError as e:
+                # e.g. still mapped by another process on Windows
+                _logger.warning("Could not remove old cache file: %s" % e)
+    _logger.info("Cached schema.org %s as %s" % (schemaver, folder))
+    return meta
+
+def entries():
+    """List metadata of all cached versions"""
+    found = []
+    for name in _cached_versions():
+        meta = lookup(name)
+        if meta:
+            meta["size"] = os.path.getsize(payload_path(meta))
+            found.append(meta)
+    return found
+
+def purge(versions=None):
+    """Remove the given cached versions, or all if None.
+
+    Only folders of cache entries are removed, not any other files in
+    the cache directory. Returns the list of removed versions.
+    """
+    if not versions:
+        versions = _cached_versions()
+    removed = []
+    for schemaver in versions:
+        folder = _version_dir(schemaver)
+        if os.path.isfile(os.path.join(folder, METADATA_FILE)):
+            shutil.rmtree(folder)
+            removed.append(schemaver)
+        else:
+            _logger.warning("schema.org %s is not cached" % schemaver)
+    return removed
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(prog="schemaorg-cache",
+        description='Inspect or purge the local cache of schema.org vocabularies')
+    parser.add_argument('--cache-dir', metavar="DIR", default=None,
+        help="Cache directory (default: %s)" % default_cache_dir())
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    commands.add_parser("list", help="List cached schema.org versions")
+    purge_parser = commands.add_parser("purge", help="Remove cached schema.org versions")
+    purge_parser.add_argument("versions", metavar="VERSION", nargs="*",
+        help='schema.org version to remove, e.g. 10.0 (default: all)')
+    return parser.parse_args(args)
+
+def main(args=None):
+    """Inspect or purge the cache"""
+    args = parse_args(args)
+    logging.basicConfig()
+    if args.cache_dir:
+        set_cache_dir(args.cache_dir)
+    if args.command == "list":
+        for meta in entries():
+            print("%s\t%s\t%s\t%d bytes\t%s" % (meta["schemaver"], meta["sha256"][:12],
+                meta["created"], meta["size"], meta["url"]))
+    elif args.command == "purge":
+        try:
+            removed = purge(args.versions)
+        except ValueError as e:
+            _logger.fatal(e)
+            return errno.EINVAL
+        for schemaver in removed:
+            print("Removed %s" % schemaver)
+    return 0
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Render examples for a whole schema.org vocabulary
+
+Every class, and every property with each of its domains and ranges,
+gets an example as by make_examples(). Terms are split into shards
+that are rendered in parallel and written as JSON Lines files, one
+record per example. Each shard file is only created once complete, so
+an interrupted run resumes with the shards that are missing.
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import namedtuple
+
+from . import schemaorg
+from . import timings
+from .schemaorg import (SchemaContext, SchemaClass, SchemaProperty,
+    make_example_class, make_example_property)
+from .main import Status, _setup, _add_common_arguments, LOG_ANNOUNCE
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "corpus.json"
+SHARD_FILE = "examples-%05d.jsonl"
+# Terms per shard
+SHARD_SIZE = 100
+
+ShardResult = namedtuple("ShardResult", "index filename examples seconds error resumed")
+
+def term_ids(context: SchemaContext):
+    """(kind, vocabulary id) of every class, then every property, in URI order"""
+    vocab = context.vocabulary
+    return ([(SchemaClass, i) for i in vocab.terms(vocab.CLASS)] +
+        [(SchemaProperty, i) for i in vocab.terms(vocab.PROPERTY)])
+
+def examples(kind, uri, context: SchemaContext):
+    """Example records of a schema.org class or property uri, as dicts"""
+    term = kind.as_type(uri, context)
+    if kind is SchemaClass:
+        yield {"kind": "class", "term": str(term), "uri": term.uri,
+            "example": make_example_class(term, term.includedInDomainOfWithSuper())}
+        return
+    for d in term.domainIncludesWithSuper():
+        for r in term.rangeIncludesWithSuper():
+            yield {"kind": "property", "term": str(term), "uri": term.uri,
+                "domain": str(d), "range": str(r),
+                "example": make_example_property(d, term, r)}
+
+def _manifest(context, shardSize, terms):
+    return {"schema_version": schemaorg.get_version(context),
+        "shard_size": shardSize,
+        "terms": terms,
+        "shards": -(-terms // shardSize)}
+
+def _renderShard(job, context=None):
+    (index, terms, filename) = job
+    context = context or _workerContext
+    start = time.perf_counter()
+    (count, error) = (0, None)
+    tmp = filename + ".tmp"
+    try:
+        uris = context.vocabulary.uris
+        with open(tmp, "w", encoding="utf-8") as f:
+            for (kind, i) in terms:
+                for record in examples(kind, uris[i], context):
+                    f.write(json.dumps(record) + "\n")
+                    count += 1
+        os.replace(tmp, filename)
+    except (ValueError, OSError) as e:
+        error = e
+    return ShardResult(index, filename, count, time.perf_counter() - start, error, False)
+
+# SchemaContext of worker process
+_workerContext = None
+
+def _initWorker(context):
+    global _workerContext
+    _workerContext = context
+    timings.reset()
+
+def generate_corpus(outputDir, shardSize=SHARD_SIZE, jobs=1, restart=False, context=None):
+    """Write examples of the whole vocabulary of context to outputDir.
+
+    Shards already in outputDir from an earlier run are kept, unless
+    restart. Raises ValueError if outputDir has a corpus of another
+    schema.org version or shard size. Returns list of ShardResult in
+    the order shards finished.
+    """
+    context = context or schemaorg.default_context()
+    os.makedirs(outputDir, exist_ok=True)
+    terms = term_ids(context)
+    manifest = _manifest(context, shardSize, len(terms))
+    manifestPath = os.path.join(outputDir, MANIFEST_FILE)
+    earlier = None
+    if os.path.exists(manifestPath):
+        with open(manifestPath, encoding="utf-8") as f:
+            earlier = json.load(f)
+        if earlier != manifest and not restart:
+            raise ValueError("%s has examples of schema.org %s in shards of %s terms, "
+                "use --force to start over" %
+                (outputDir, earlier.get("schema_version"), earlier.get("shard_size")))
+    if restart or earlier != manifest:
+        # Shards are only resumed from a run with the same manifest
+        for name in os.listdir(outputDir):
+            if name.startswith("examples-") and name.endswith((".jsonl", ".tmp")):
+                os.remove(os.path.join(outputDir, name))
+    with open(manifestPath, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    results = []
+    work = []
+    for index in range(manifest["shards"]):
+        filename = os.path.join(outputDir, SHARD_FILE % index)
+        if os.path.exists(filename):
+            results.append(ShardResult(index, filename, None, 0.0, None, True))
+        else:
+            work.append((index, terms[index*shardSize:(index+1)*shardSize], filename))
+    if results:
+        _logger.info("Resuming with %d of %d shards done" % (len(results), manifest["shards"]))
+    # Create all types before forking, so workers share them
+    context.materialize()
+    pool = None
+    if jobs > 1 and len(work) > 1:
+        import multiprocessing
+        if "fork" in multiprocessing.get_all_start_methods():
+            mp = multiprocessing.get_context("fork")
+        else:
+            mp = multiprocessing.get_context()
+        pool = mp.Pool(jobs, _initWorker, (context,))
+        rendered = pool.imap_unordered(_renderShard, work)
+    else:
+        rendered = (_renderShard(job, context) for job in work)
+    try:
+        for r in rendered:
+            if r.error:
+                _logger.error("Failed to render shard %d: %s" % (r.index, r.error))
+            else:
+                _logger.info("Wrote %d examples to %s" % (r.examples, r.filename))
+            results.append(r)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return results
+
+def printCorpusSummary(results, out=sys.stdout):
+    resumed = sum(1 for r in results if r.resumed)
+    failed = sum(1 for r in results if r.error)
+    examples = sum(r.examples or 0 for r in results)
+    seconds = sum(r.seconds for r in results)
+    out.write("%d shards, %d resumed, %d failed, %d examples rendered in %.3fs\n" %
+        (len(results), resumed, failed, examples, seconds))
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(prog="schemaorg-example corpus",
+        description="Render examples for every schema.org class and property "
+            "to sharded JSON Lines files, resuming an interrupted run")
+    parser.add_argument("--output-dir", "-O", metavar="DIR", default="examples",
+        help="Directory to write shards to (default: %(default)s)")
+    parser.add_argument("--shard-size", metavar="N", type=int, default=SHARD_SIZE,
+        help="Number of terms per shard (default: %(default)s)")
+    parser.add_argument("--jobs", "-j", metavar="N", type=int, default=1,
+        help="Number of worker processes rendering shards (default: 1)")
+    parser.add_argument('--force', '-f', action="store_true",
+        help="Start over, removing shards of an earlier run")
+    _add_common_arguments(parser, output=False)
+    return parser.parse_args(args)
+
+def main(args=None):
+    """Render the example corpus"""
+    args = parse_args(args)
+    if args.shard_size < 1:
+        _logger.fatal("--shard-size must be at least 1")
+        return Status.OTHER_ERROR
+    try:
+        _setup(args)
+        results = generate_corpus(args.output_dir, args.shard_size, args.jobs, args.force)
+    except ValueError as e:
+        _logger.fatal(e)
+        return Status.OTHER_ERROR
+    except OSError as e:
+        _logger.fatal(e)
+        return Status.IO_ERROR
+    finally:
+        if timings.enabled:
+            timings.print_report()
+    printCorpusSummary(results)
+    if any(r.error for r in results):
+        return Status.OTHER_ERROR
+    _logger.log(LOG_ANNOUNCE, "Generated examples in %s" % os.path.abspath(args.output_dir))
+    return Status.OK
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Compare schema.org versions and regenerate only affected profiles
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import sys
+import logging
+import argparse
+from collections import namedtuple, OrderedDict
+
+from . import schemaorg
+from .schemaorg import SchemaContext
+from .vocabulary import Vocabulary
+from .main import (Status, generate_batch, printBatchSummary, profileFilename,
+    read_header, _setup, _add_batch_arguments, _add_common_arguments, _batch_types,
+    _overwrite)
+
+_logger = logging.getLogger(__name__)
+
+# Vocabulary columns compared per term, and their report names
+ASPECTS = (
+    ("labels", "label"),
+    ("comments", "comment"),
+    ("supertypes", "supertypes"),
+    ("domainIncludes", "domainIncludes"),
+    ("rangeIncludes", "rangeIncludes"),
+)
+
+# Aspects of expected types that affect a mapping entry, which renders
+# their names, and the example value of the hierarchy of the first one
+RANGE_ASPECTS = frozenset(("added", "removed", "label", "supertypes"))
+# Aspects of ancestors that affect the hierarchy, which only renders
+# their names; e.g. a changed comment of Thing does not affect profiles
+HIERARCHY_ASPECTS = frozenset(("label", "supertypes", "domainIncludes", "rangeIncludes"))
+
+ProfileDelta = namedtuple("ProfileDelta", "schematype added removed changed hierarchy")
+
+ProfileFile = namedtuple("ProfileFile", "schematype filename name group")
+ProfileFile.__doc__ = """Existing profile of schematype, see profile_files()"""
+
+def term_changes(old: Vocabulary, new: Vocabulary):
+    """Find schema.org terms that differ between two vocabularies.
+
+    Returns dict of term URI to list of changed aspects, e.g. ["comment"],
+    or ["added"] / ["removed"].
+    """
+    changes = {}
+    oldTerms = old.classes | old.properties
+    newTerms = new.classes | new.properties
+    for uri in oldTerms - newTerms:
+        changes[uri] = ["removed"]
+    for uri in newTerms - oldTerms:
+        changes[uri] = ["added"]
+    for uri in oldTerms & newTerms:
+        aspects = [name for (attr, name) in ASPECTS
+            if old.get(attr, uri) != new.get(attr, uri)]
+        if aspects:
+            changes[uri] = aspects
+    return changes
+
+def profile_terms(schematype, context: SchemaContext):
+    """Terms a generated profile of schematype depends on, by property name.
+
+    Returns (hierarchy, properties) where hierarchy is the list of ancestor
+    URIs and properties maps each mapped property name to a dict of the
+    term URIs its mapping entry is rendered from, and which aspects of
+    those terms matter (None for all); or (None, {}) if schematype is not
+    in this version.
+    """
+    try:
+        typ = schemaorg.find_class(schematype, context)
+    except ValueError:
+        return (None, {})
+    properties = {}
+    for (s_type, props) in schemaorg.find_properties(schematype, context).items():
+        for prop in props:
+            terms = properties.setdefault(str(prop), {})
+            terms[prop.uri] = None
+            ranges = prop.rangeIncludes
+            # Only the names of expected types are rendered, and the
+            # example value depends on the hierarchy of the first type
+            for r in ranges + (ranges and ranges[0].ancestors):
+                terms.setdefault(r.uri, RANGE_ASPECTS)
+    return ([a.uri for a in typ.ancestors], properties)
+
+def profile_delta(schematype, old: SchemaContext, new: SchemaContext, changes):
+    """Compare the profile of schematype between old and new,
+    returning a ProfileDelta, or None if the profile is unaffected."""
+    (oldHierarchy, oldProps) = profile_terms(schematype, old)
+    (newHierarchy, newProps) = profile_terms(schematype, new)
+    added = sorted(set(newProps) - set(oldProps))
+    removed = sorted(set(oldProps) - set(newProps))
+    changed = {}
+    for name in sorted(set(oldProps) & set(newProps)):
+        aspects = set()
+        for terms in (oldProps[name], newProps[name]):
+            for (uri, relevant) in terms.items():
+                aspects.update(a for a in changes.get(uri, ())
+                    if relevant is None or a in relevant)
+        if aspects:
+            changed[name] = sorted(aspects)
+    hierarchy = (oldHierarchy != newHierarchy or
+        any(HIERARCHY_ASPECTS.intersection(changes.get(uri, ()))
+            for uri in newHierarchy or ()))
+    if added or removed or changed or hierarchy:
+        return ProfileDelta(schematype, added, removed, changed, hierarchy)
+    return None
+
+def _exists(schematype, context):
+    try:
+        schemaorg.find_class(schematype, context)
+        return True
+    except ValueError:
+        return False
+
+def profile_files(directory):
+    """ProfileFile of each profile in directory, with the name and group
+    from its header so it can be regenerated in place"""
+    files = []
+    if not os.path.isdir(directory):
+        return files
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".html"):
+            continue
+        try:
+            header = read_header(os.path.join(directory, name))
+        except ValueError as e:
+            _logger.warning("Skipping profile: %s" % e)
+            continue
+        if header and header.get("official_type"):
+            files.append(ProfileFile(str(header["official_type"]),
+                os.path.join(directory, name), header.get("name"), header.get("group")))
+    return files
+
+def printDelta(delta, out=sys.stdout):
+    parts = []
+    if delta.hierarchy:
+        parts.append("hierarchy")
+    parts.extend("+" + p for p in delta.added)
+    parts.extend("-" + p for p in delta.removed)
+    parts.extend("~%s(%s)" % (p, ",".join(a)) for (p, a) in delta.changed.items())
+    out.write("%s: %s\n" % (delta.schematype, " ".join(parts)))
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(prog="bioschemas-profilegen diff",
+        description='Compare profiles between schema.org versions, '
+            'and regenerate only the profiles that changed')
+    parser.add_argument("--from", dest="fromver", metavar="VERSION", required=True,
+        help='previous schema.org version, e.g. 11.0')
+    parser.add_argument("--dry-run", "-n", action="store_true",
+        help="Only report changes, do not regenerate profiles")
+    _add_batch_arguments(parser)
+    _add_common_arguments(parser)
+    return parser.parse_args(args)
+
+def main(args=None):
+    """Report and regenerate profiles affected by a new schema.org version.
+
+    Profiles are the given types, or else the profiles already in the
+    output directory. The new version is --schemaver (default "latest").
+    """
+    args = parse_args(args)
+    _setup(args, [args.fromver])
+    new = schemaorg.default_context()
+    old = schemaorg.get_context(args.fromver, args.offline)
+    schematypes = _batch_types(args, new)
+    if schematypes:
+        files = [ProfileFile(t, os.path.join(args.output_dir, profileFilename(t)), None, None)
+            for t in schematypes]
+    else:
+        files = profile_files(args.output_dir)
+        # Several profiles can be of the same type
+        schematypes = list(OrderedDict.fromkeys(f.schematype for f in files))
+    if not schematypes:
+        _logger.fatal("No schema.org types given or found in %s" % args.output_dir)
+        return Status.TYPE_NOT_FOUND
+
+    changes = term_changes(old.vocabulary, new.vocabulary)
+    _logger.info("%d schema.org terms changed from %s to %s" %
+        (len(changes), old.version, new.version))
+    deltas = []
+    for schematype in schematypes:
+        delta = profile_delta(schematype, old, new, changes)
+        if delta:
+            deltas.append(delta)
+            printDelta(delta)
+    print("%d of %d types affected" % (len(deltas), len(schematypes)))
+    if args.dry_run or not deltas:
+        return Status.OK
+
+    # Types removed from the new version are reported, but not regenerated
+    regenerate = set(d.schematype for d in deltas if _exists(d.schematype, new))
+    affected = [f for f in files if f.schematype in regenerate]
+    results = generate_batch([f.schematype for f in affected], args.output_dir,
+        _overwrite(args), args.jobs, context=new, update=args.update,
+        profiles=[(f.filename, f.name, f.group) for f in affected])
+    printBatchSummary(results)
+    if any(r.error for r in results):
+        return Status.OTHER_ERROR
+    return Status.OK
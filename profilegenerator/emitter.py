@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Write profile YAML directly, with the same output as PyYAML
+
+Profiles are block mappings and sequences of strings, so their layout
+follows from the nesting alone. Only scalars need PyYAML's choice of
+style and line wrapping, which depends on the value and its column:
+each distinct key and value is rendered once by PyYAML at its column
+and the text reused. Examples are multi-line and differ per profile, so
+literal block scalars (`|-`) are written directly when PyYAML would
+write them unchanged. Anything else, e.g. numbers or shared objects in
+an updated profile, is dumped by PyYAML instead.
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import re
+from functools import lru_cache
+
+from .main import _yaml
+
+# Distinct (column, key, value) renderings kept by _pair()
+PAIR_CACHE_SIZE = 16384
+
+# Multi-line text PyYAML writes as a literal block scalar with "-"
+# chomping and no indentation indicator: printable ASCII without
+# leading or trailing whitespace (and without spaces before line breaks)
+_LITERAL = re.compile(r"[!-~](?:[ -~\n]*[!-~])?\Z")
+
+class Fallback(Exception):
+    """Data that is not written directly, but dumped by PyYAML"""
+
+def pyyaml_dump(data) -> str:
+    """YAML of data as dumped by PyYAML, in the style of profiles"""
+    return _yaml().dump(data, default_flow_style=False, default_style='"', sort_keys=False)
+
+def dump(data) -> str:
+    """YAML of data, the same as pyyaml_dump(data)"""
+    out = []
+    try:
+        if type(data) is dict and data:
+            _mapping(data, 0, "", out, set())
+        elif type(data) is list and data:
+            _sequence(data, 0, "", out, set())
+        else:
+            raise Fallback(data)
+    except Fallback:
+        return pyyaml_dump(data)
+    return "".join(out)
+
+def _nested(data, column):
+    # data as the first item of sequences nested to start at column
+    for i in range(column // 2):
+        data = [data]
+    return data
+
+@lru_cache(maxsize=PAIR_CACHE_SIZE)
+def _pair(column, key, value) -> str:
+    """Text of key: value in a block mapping at column, starting with
+    the key and with any further lines indented"""
+    text = pyyaml_dump(_nested({key: value}, column))
+    if text.endswith("...\n"):
+        # Open ended, e.g. a block scalar keeping its final line breaks,
+        # so PyYAML ends the document differently if this is the last key
+        raise Fallback(value)
+    return text[column:]
+
+@lru_cache(maxsize=1024)
+def _key(column, key) -> str:
+    """Text of key of a block mapping at column"""
+    text = _pair(column, key, None)
+    if "\n" in text[:-1] or not text.endswith(': !!null ""\n'):
+        raise Fallback(key)
+    return text[:-len(' !!null ""\n')]
+
+def _literal(column, key, value, out, lead):
+    indent = " " * (column + 2)
+    out.append(lead + _key(column, key) + " |-\n")
+    for line in value.split("\n"):
+        out.append(indent + line + "\n" if line else "\n")
+
+def _collection(data, seen):
+    # PyYAML writes anchors and aliases for collections seen before
+    if id(data) in seen:
+        raise Fallback(data)
+    seen.add(id(data))
+    return data
+
+def _mapping(data, column, lead, out, seen):
+    """Block mapping at column, its first key written after lead"""
+    _collection(data, seen)
+    indent = " " * column
+    for (key, value) in data.items():
+        if type(key) is not str:
+            raise Fallback(key)
+        kind = type(value)
+        if kind is str and "\n" in value and " \n" not in value and _LITERAL.match(value):
+            _literal(column, key, value, out, lead)
+        elif kind is str or value is None:
+            out.append(lead + _pair(column, key, value))
+        elif kind is list and value:
+            out.append(lead + _key(column, key) + "\n")
+            # Sequences in mappings are not indented
+            _sequence(value, column, indent, out, seen)
+        elif kind is dict and value:
+            out.append(lead + _key(column, key) + "\n")
+            _mapping(value, column + 2, " " * (column + 2), out, seen)
+        elif kind is list or kind is dict:
+            _collection(value, seen)
+            out.append(lead + _key(column, key) + (" []\n" if kind is list else " {}\n"))
+        else:
+            raise Fallback(value)
+        lead = indent
+
+def _sequence(data, column, lead, out, seen):
+    """Block sequence at column, its first item written after lead"""
+    _collection(data, seen)
+    indent = " " * column
+    for item in data:
+        kind = type(item)
+        if kind is dict and item:
+            _mapping(item, column + 2, lead + "- ", out, seen)
+        elif kind is list and item:
+            _sequence(item, column + 2, lead + "- ", out, seen)
+        elif kind is list or kind is dict:
+            _collection(item, seen)
+            out.append(lead + ("- []\n" if kind is list else "- {}\n"))
+        else:
+            raise Fallback(item)
+        lead = indent
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Resumable, conditional download of schema.org releases
+
+The JSON-LD is streamed to a partial file, so an interrupted download
+is resumed with a Range request rather than started over. Passing the
+ETag/Last-Modified of the cached copy revalidates it, only downloading
+again if the release changed. download_all() runs several downloads
+concurrently with asyncio, handing each finished file on for parsing
+while the others are still arriving.
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import json
+import logging
+from collections import namedtuple
+
+from . import timings
+
+_logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# Seconds without data before giving up (the partial file is kept)
+TIMEOUT = 60
+
+# Validators of the partial download, to resume only the same release
+PARTIAL_SUFFIX = ".json"
+
+Download = namedtuple("Download", "url path etag last_modified modified")
+Download.__doc__ = """Result of download(). If not modified, path is None
+and etag/last_modified are the validators that were given"""
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+def download(url, path, etag=None, last_modified=None) -> Download:
+    """Stream url to path, resuming an earlier partial download in path.
+
+    With etag or last_modified of a local copy, returns a Download that
+    is not modified if the server reports the copy is still current.
+    """
+    import urllib.request # only needed on cache miss
+    import urllib.error
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    offset = 0
+    partial = _read_json(path + PARTIAL_SUFFIX)
+    if os.path.exists(path) and partial and partial.get("url") == url:
+        validator = partial.get("etag") or partial.get("last_modified")
+        if validator:
+            offset = os.path.getsize(path)
+            # Rest of the file, or all of it if the release changed meanwhile
+            headers["Range"] = "bytes=%d-" % offset
+            headers["If-Range"] = validator
+    request = urllib.request.Request(url, headers=headers)
+    with timings.phase("download"):
+        try:
+            response = urllib.request.urlopen(request, timeout=TIMEOUT)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                _logger.info("Not modified: %s" % url)
+                return Download(url, None, etag, last_modified, False)
+            if e.code == 416 and offset:
+                # Partial file is already complete, or no longer matches
+                _logger.info("Restarting download of %s" % url)
+                os.remove(path)
+                return download(url, path, etag, last_modified)
+            raise
+        with response:
+            if response.getcode() != 206:
+                offset = 0
+            validators = {"url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")}
+            _write_json(path + PARTIAL_SUFFIX, validators)
+            if offset:
+                _logger.info("Resuming %s from byte %d" % (url, offset))
+            else:
+                _logger.info("Downloading %s" % url)
+            expected = response.headers.get("Content-Length")
+            received = 0
+            with open(path, "ab" if offset else "wb") as f:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    received += len(chunk)
+                    timings.count("download_bytes", len(chunk))
+            if expected and received < int(expected):
+                # Keep the partial file to resume next time
+                raise ConnectionError("Download of %s interrupted after %d of %s bytes" %
+                    (url, offset + received, offset + int(expected)))
+    return Download(url, path, validators["etag"], validators["last_modified"], True)
+
+def discard(path):
+    """Remove a (partial) download and its validators"""
+    for p in (path, path + PARTIAL_SUFFIX):
+        if os.path.exists(p):
+            os.remove(p)
+
+async def _download_then(loop, job, then):
+    d = await loop.run_in_executor(None, download, *job)
+    return await loop.run_in_executor(None, then, d)
+
+async def _gather(loop, jobs, then):
+    import asyncio
+    return await asyncio.gather(*(_download_then(loop, job, then) for job in jobs),
+        return_exceptions=True)
+
+def download_all(jobs, then):
+    """Download concurrently, calling then(Download) as each finishes.
+
+    jobs are tuples of download() arguments. Returns the results of
+    then() in the order of jobs; the first failure is raised once all
+    jobs have finished.
+    """
+    import asyncio # only needed on cache miss
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(_gather(loop, jobs, then))
+    finally:
+        loop.close()
+    for r in results:
+        if isinstance(r, BaseException):
+            raise r
+    return results
@@ -17,19 +17,23 @@ __copyright__ = """© 2020 Heriot-Watt University, UK
 __license__ = "MIT" # https://spdx.org/licenses/MIT
 
 import sys
+import time
 import errno
 import logging
 import argparse
 from enum import IntEnum
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
 
 from ._version import __version__
 from ._logging import LOG_TRACE, LOG_ANNOUNCE
 from .schemaorg import SCHEMA, SchemaProperty, SchemaClass
 from . import schemaorg
-from .profileTemplate import profileHeader, profileProperty, profileType, profileFooter
+from . import cache
+from . import timings
+from .profileTemplate import profileHeader, profileProperty, profileType, profileFooter, versionDateNow
 from .profileConstants import *
 
-import yaml
 import os
 
 _logger = logging.getLogger(__name__)
@@ -61,7 +65,6 @@ def _str_presenter(dumper, data):
     else:
         style=''
     return dumper.represent_scalar('tag:yaml.org,2002:str', data, style=style)
-yaml.add_representer(str, _str_presenter)
 
 ##
 
@@ -69,13 +72,54 @@ yaml.add_representer(str, _str_presenter)
 # CC BY-SA 4.0 by Jace Browning & Anthon
 def represent_none(self, _):
     return self.represent_scalar('tag:yaml.org,2002:null', '')
-yaml.add_representer(type(None), represent_none)
 ##
 
+@lru_cache(maxsize=None)
+def _yaml():
+    """Import and configure yaml on first use, keeping --help fast"""
+    import yaml
+    yaml.add_representer(str, _str_presenter)
+    yaml.add_representer(type(None), represent_none)
+    return yaml
 
 
+
+def _add_common_arguments(parser, output=True):
+    """Arguments of all subcommands, read by _setup(). With output,
+    also those of writing profiles, see _overwrite()"""
+    parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
+
+    if output:
+        parser.add_argument('--force', '-f', action="store_true",
+            help="Do not ask before overwriting profile output file")
+        parser.add_argument('--if-exists', metavar="POLICY", default=None,
+            choices=("ask", "overwrite", "skip", "fail"),
+            help="What to do with existing profile output files: ask (default, "
+                "skip if stdin is not a terminal), overwrite, skip or fail")
+        parser.add_argument('--update', '-u', action="store_true",
+            help="Update existing profiles, keeping fields filled in by curators "
+                "and only writing profiles that changed")
+
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+        help='Increase verbosity level. Repeat -v for debug and trace logs')
+
+    parser.add_argument("--schemaver", "-s", metavar="VERSION",
+        help='schema.org version to fetch, e.g. 10.0 (default: "latest")',
+        default="latest")
+    parser.add_argument("--offline", action="store_true",
+        help="Only use the local schema.org cache; fail if VERSION is not cached")
+    parser.add_argument("--refresh", action="store_true",
+        help="Check if cached VERSION changed, and download it again if so")
+    parser.add_argument("--cache-dir", metavar="DIR", default=None,
+        help="schema.org cache directory (default: %s)" % cache.default_cache_dir())
+    parser.add_argument("--profile-timings", action="store_true",
+        help="Print time spent per phase (download, parse, rendering..) at exit")
+
 def parse_args(args=None):
-    parser = argparse.ArgumentParser(description='Generate Bioschemas.org profile template for a given schema.org type')
+    parser = argparse.ArgumentParser(description='Generate Bioschemas.org profile template for a given schema.org type',
+        epilog='Use "%(prog)s batch -h" to generate profiles for many types, '
+            '"%(prog)s diff -h" to update profiles to a new schema.org version, '
+            'or "%(prog)s usage -h" to find which types and profiles use a property')
 
     # Common options
     parser.add_argument("schematype", metavar="TYPE",
@@ -84,118 +128,436 @@ def parse_args(args=None):
         help='bioschema.org profile name, e.g. "Dataset" (default: same as TYPE)',
         default=None)
 
-    parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
-
-    parser.add_argument('--force', '-f', action="store_true",
-        help="Do not ask before overwriting profile output file")
-
     parser.add_argument('--output', '-o', metavar="OUTPUT", default=None,
         help="Set profile output file, or `-` for stdout (default: PROFILE-0.1-DRAFT.html)")
 
-    parser.add_argument('-v', '--verbose', action='count', default=0,
-        help='Increase verbosity level. Repeat -v for debug and trace logs')
-
     parser.add_argument("--group", "-g", metavar="GROUP",
         help='bioschema.org profile name, e.g. "Workflow" (default: same as PROFILE)',
         default=None)    
     parser.add_argument("--description", "-d", metavar="DESCRIPTION",
         help="bioschema.org profile description (default: TYPE's schema.org description)",
         default=None)
-    parser.add_argument("--schemaver", "-s", metavar="VERSION",
-        help='schema.org version to fetch, e.g. 10.0 (default: "latest")',
-        default="latest")
+    _add_common_arguments(parser)
     return parser.parse_args(args)
 
+def parse_batch_args(args=None):
+    parser = argparse.ArgumentParser(prog="bioschemas-profilegen batch",
+        description='Generate Bioschemas.org profile templates for many schema.org types')
+    _add_batch_arguments(parser)
+    _add_common_arguments(parser)
+    return parser.parse_args(args)
 
-
-def generate(schematype, profileName=None, groupName=None, description=None, filename=None, overwrite=False):
-    """Generate bioschemas profile for a given schematype"""
+def _add_batch_arguments(parser):
+    parser.add_argument("schematypes", metavar="TYPE", nargs="*",
+        help='schema.org type, e.g. "Dataset"')
+    parser.add_argument("--types-file", "-t", metavar="FILE", default=None,
+        help="Read schema.org types from FILE, one per line (`-` for stdin)")
+    parser.add_argument("--subclasses-of", "-c", metavar="TYPE", default=None,
+        help='Include TYPE and all its schema.org subclasses, e.g. "CreativeWork"')
+    parser.add_argument("--output-dir", "-O", metavar="DIR", default=".",
+        help="Directory to write profiles to (default: current directory)")
+    parser.add_argument("--jobs", "-j", metavar="N", type=int, default=1,
+        help="Number of worker processes rendering profiles (default: 1)")
+
+def _read_types(filename):
+    """Read schema.org types from file, one per line, ignoring # comments"""
+    if filename == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(filename, encoding="utf-8") as f:
+            lines = f.readlines()
+    types = []
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if line:
+            types.append(line)
+    return types
+
+def generate(schematype, profileName=None, groupName=None, description=None, filename=None, overwrite=False, versionDate=None, context=None, update=False):
+    """Generate bioschemas profile for a given schematype, 
+    using the schemaorg.SchemaContext (default: schemaorg.default_context())
+
+    With update, an existing profile is updated as by update.updateProfile()
+    rather than overwritten, and not written if unchanged (returning None).
+    """
+    assert schematype
+    profileName = profileName or schematype
+    version = "0.1"
+    status = STATUS_DRAFT
+    with timings.phase("profile"):
+        if update:
+            from .update import updateProfile # imports this module
+            filename = filename or profileFilename(profileName, version, status)
+            profile = updateProfile(schematype, filename, profileName, groupName, description, versionDate, context)
+            if profile is None:
+                return None
+            overwrite = True
+        else:
+            profile = streamProfile(schematype, profileName, groupName, description, version, status, versionDate, context=context)
+        return writeToFile(profileName, version, status, profile, filename, overwrite)
+
+def renderProfile(schematype, profileName=None, groupName=None, description=None, version="0.1", status=STATUS_DRAFT, versionDate=None, mapping=None, context=None):
+    """Render bioschemas profile for a given schematype, returning it as a string"""
+    with timings.phase("profile"):
+        return "".join(streamProfile(schematype, profileName, groupName, description, version, status, versionDate, mapping, context))
+
+def renderMapping(schematype, context=None):
+    """Render the YAML 'mapping' section for a given schematype.
+
+    This only depends on the schema.org vocabulary, so it can be
+    reused for renderProfile(mapping=..)
+    """
+    typ = schemaorg.find_class(schematype, context)
+    props = schemaorg.find_properties(schematype, context)
+    return "".join(_streamMapping(typ, props))
+
+def _dumpYaml(data):
+    from . import emitter # imports this module
+    with timings.phase("yaml_dump"):
+        return emitter.dump(data)
+
+def streamProfile(schematype, profileName=None, groupName=None, description=None, version="0.1", status=STATUS_DRAFT, versionDate=None, mapping=None, context=None):
+    """Render bioschemas profile for a given schematype as an iterator of strings.
+
+    The header is produced first, then one mapping entry at a time,
+    so only a single property is held in memory. The schema.org type is
+    looked up before returning, so unknown types fail before any output.
+    """
     assert schematype
     profileName = profileName or schematype
     groupName = groupName or profileName    
     
-
-    typ = schemaorg.find_class(schematype)
-    props = schemaorg.find_properties(schematype)
+    typ = schemaorg.find_class(schematype, context)
+    props = schemaorg.find_properties(schematype, context)
     
-    ## TODO: Make yaml, template etc.
     _logger.info("Profile: %s" % profileName)
-    schemaver = schemaorg.get_version()
+    schemaver = schemaorg.get_version(typ.context)
     _logger.info("Based on schema.org %s version %s" % (typ, schemaver))
-    mappingProperies = []
+
+    superclasses = list(reversed(typ.ancestors))
+    description = description or typ.comment or profileName 
+    profileDict = profileHeader(profileName, schematype, schemaver, False, description, version, status, groupName, False, versionDate)
+    profileDict['hierarchy'] = profileType(superclasses)
+    return _streamProfile(typ, props, profileDict, mapping)
+
+def _streamProfile(typ, props, profileDict, mapping=None):
+    yield '---\n'
+    yield _dumpYaml(profileDict)
+    if mapping is None:
+        yield from _streamMapping(typ, props)
+    else:
+        yield mapping
+    yield '---\n'
+    yield profileFooter()
+
+def _streamMapping(typ, props):
+    empty = True
     for (s_type, s_props) in props.items():
         _logger.debug("Type: %s " % s_type)
         _logger.debug("Properties: %s", s_props)        
         for prop in s_props:
-            propertyName = str(prop)
-            expectedTypes = profileType(prop.rangeIncludes)
-            schemaDescription = prop.comment or prop.label or str(prop)
-            bsDescription = 'TODO: Bioschemas description'
-            marginality = MARGINALITY_UNSPECIFIED
-            cardinality = ""
-            controlledVocabs = ""
-            example = schemaorg.make_example_property(typ, prop, 
-                prop.rangeIncludes and prop.rangeIncludes[0])
             # TODO: record which s_type this property belongs to
-            mappingProperies.append(profileProperty(propertyName, expectedTypes, schemaDescription, 
-                bsDescription, marginality, cardinality, controlledVocabs, example))
-
-    superclasses = typ.ancestors
-    superclasses.reverse()
-    description = description or typ.comment or profileName 
-    version = "0.1"
-    status = STATUS_DRAFT
-    profile = '---\n'
-    profileDict = profileHeader(profileName, schematype, schemaver, False, description, version, status, groupName, False)
-    profileDict['hierarchy'] = profileType(superclasses)
-    profileDict['mapping'] = mappingProperies
-    profile += yaml.dump(profileDict, default_flow_style=False, default_style='"', sort_keys=False)
-    profile += '---\n'
-    profile += profileFooter()
-    writeToFile(profileName, version, status, profile, filename, overwrite)
-    # print(profile)
+            mappingProperty = mappingEntry(typ, prop)
+            if empty:
+                yield 'mapping:\n'
+                empty = False
+            yield dumpMappingEntry(mappingProperty)
+    if empty:
+        yield _dumpYaml({'mapping': []})
+
+def mappingEntry(typ, prop):
+    """Mapping entry of schema.org property prop in the profile of typ, as a dict"""
+    propertyName = str(prop)
+    expectedTypes = profileType(prop.rangeIncludes)
+    schemaDescription = prop.comment or prop.label or str(prop)
+    bsDescription = 'TODO: Bioschemas description'
+    marginality = MARGINALITY_UNSPECIFIED
+    cardinality = ""
+    controlledVocabs = ""
+    example = schemaorg.make_example_property(typ, prop, 
+        prop.rangeIncludes and prop.rangeIncludes[0])
+    return profileProperty(propertyName, expectedTypes, schemaDescription, 
+        bsDescription, marginality, cardinality, controlledVocabs, example)
+
+def dumpMappingEntry(mappingProperty):
+    # Top-level sequence is emitted the same as the indentless
+    # sequence under the 'mapping' key
+    return _dumpYaml([mappingProperty])
+
+def profileFilename(profileName, version="0.1", status=STATUS_DRAFT):
+    return profileName+'-'+version+'-'+status+'.html'
+
+def read_front_matter(filename):
+    """Text of the YAML front-matter of the profile in filename and the
+    text after it, as (front, footer), or None if it has no front-matter"""
+    with open(filename, encoding="utf-8") as f:
+        parts = f.read().split("---\n", 2)
+    if len(parts) < 3 or parts[0]:
+        return None
+    return (parts[1], parts[2])
+
+def read_header(filename):
+    """YAML front-matter of the profile in filename as a dict, or None if
+    it has no front-matter. Raises ValueError if it is not a YAML mapping."""
+    found = read_front_matter(filename)
+    if found is None:
+        return None
+    yaml = _yaml()
+    try:
+        header = yaml.load(found[0], Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    except yaml.YAMLError as e:
+        raise ValueError("Invalid YAML front-matter in %s: %s" % (filename, e))
+    if not isinstance(header, dict):
+        raise ValueError("Invalid YAML front-matter in %s" % filename)
+    return header
 
 def writeToFile(profileName, version, status, profile, filename, overwrite):
+    """Write profile to filename, or `-` for stdout.
+
+    overwrite is True, False to ask, or an output.IF_EXISTS policy for
+    existing files. The file is replaced atomically, and kept if its
+    content is the same. Returns filename, or None if not overwritten.
+    """
+    from . import output
     if not filename:
-        filename = profileName+'-'+version+'-'+status+'.html'
-    if (os.path.exists(filename) and not overwrite):
-        _logger.warning("File already exists: %s" % os.path.abspath(filename))
-        while 1:
-            question = 'Overwrite '+ filename + ' (Y/n): '
-            sys.stderr.write(question)
-            choice = input().lower()
-            if choice[:1] == 'y' or choice[:1] == '':
-                break
-            elif choice[:1] == 'n':
-                _logger.fatal("File %s already exists and not overwritten." % filename)
-                return
-            else:
-                sys.stderr.write("Please respond with 'y' or 'n'.\n")
+        filename = profileFilename(profileName, version, status)
     if filename == "-":
-        fo = sys.stdout
+        if isinstance(profile, str):
+            profile = [profile]
+        with timings.phase("write"):
+            sys.stdout.writelines(profile)
+        return filename
+    if os.path.exists(filename) and not output.resolve(filename, overwrite):
+        return None
+    with timings.phase("write"):
+        written = output.write_atomic(filename, profile)
+        if written:
+            output.sync_directories([os.path.dirname(filename)])
+    if written:
+        _logger.log(LOG_ANNOUNCE, "Generated %s" % os.path.abspath(filename))
     else:
-        fo = open(filename, 'w')
-    fo.write(profile)
-    fo.close()
-    _logger.log(LOG_ANNOUNCE, "Generated %s" % os.path.abspath(filename))
+        _logger.log(LOG_ANNOUNCE, "Unchanged %s" % os.path.abspath(filename))
+    return filename
+
+# Create all schema.org types up front for batches of at least this size
+MATERIALIZE_MIN_TYPES = 20
+
+BatchResult = namedtuple("BatchResult", "schematype filename seconds error unchanged")
+
+def _renderBatchProfile(job, context=None):
+    (schematype, profileName, groupName, versionDate, updateFile) = job
+    start = time.perf_counter()
+    (profile, error) = (None, None)
+    try:
+        if updateFile:
+            from .update import updateProfile # imports this module
+            with timings.phase("profile"):
+                profile = updateProfile(schematype, updateFile, profileName, groupName,
+                    versionDate=versionDate, context=context or _batchContext)
+                profile = profile and "".join(profile)
+        else:
+            profile = renderProfile(schematype, profileName, groupName, versionDate=versionDate,
+                context=context or _batchContext)
+    except (ValueError, OSError) as e:
+        error = e
+    seconds = time.perf_counter() - start
+    # Timings of worker processes are merged by generate_batch()
+    workerTimings = _batchContext and timings.enabled and timings.snapshot(reset=True)
+    return (profile, seconds, error, workerTimings)
+
+# SchemaContext of batch worker process
+_batchContext = None
+
+def _initBatchWorker(context):
+    # With fork start method this is the context already inherited from
+    # the parent process, otherwise it arrives pickled once per worker
+    global _batchContext
+    _batchContext = context
+    # Drop any timings inherited by fork
+    timings.reset()
+
+def generate_batch(schematypes, outputDir=".", overwrite=False, jobs=1, versionDate=None, context=None, update=False, profiles=None):
+    """Generate bioschemas profiles for many schematypes, 
+    sharing the loaded schema.org vocabulary.
+
+    profiles is a list of (filename, profileName, groupName) for each of
+    schematypes, e.g. to regenerate existing profiles in place; by default
+    each type's profile is written to outputDir under its own name.
+    With update, existing profiles are updated rather than overwritten,
+    see generate().
+
+    With jobs > 1 the profiles are rendered by a pool of worker processes,
+    so the output is the same as for jobs=1. Files are written as by
+    writeToFile(), on threads of an output.ProfileWriter so that writing
+    overlaps rendering. overwrite is as for writeToFile(); asking is
+    done by this thread before the profile is passed to the writer.
+
+    Errors for a single type are logged and recorded rather than raised,
+    including a profile with the same file as an earlier one, which is
+    not written. Returns list of BatchResult in the order of schematypes.
+    """
+    from . import output
+    os.makedirs(outputDir, exist_ok=True)
+    context = context or schemaorg.default_context()
+    if jobs > 1 or len(schematypes) >= MATERIALIZE_MIN_TYPES:
+        # in one go, and before forking so workers share them
+        context.materialize()
+    # Same version_date for all, and independent of rendering order
+    versionDate = versionDate or versionDateNow()
+    if profiles is None:
+        profiles = [(os.path.join(outputDir, profileFilename(schematype)), None, None)
+            for schematype in schematypes]
+    work = [(schematype, profileName, groupName, versionDate, update and filename)
+        for (schematype, (filename, profileName, groupName)) in zip(schematypes, profiles)]
+    pool = None
+    if jobs > 1:
+        import multiprocessing
+        if "fork" in multiprocessing.get_all_start_methods():
+            mp = multiprocessing.get_context("fork")
+        else:
+            mp = multiprocessing.get_context()
+        pool = mp.Pool(jobs, _initBatchWorker, (context,))
+        rendered = pool.imap(_renderBatchProfile, work, 
+            chunksize=max(1, len(work) // (jobs*4)))
+    else:
+        rendered = (_renderBatchProfile(job, context) for job in work)
+    writer = output.ProfileWriter()
+    # BatchResult fields, with the Future of writing the profile
+    written = []
+    # path -> schematype of the profile written to it
+    targets = {}
+    try:
+        for (schematype, (filename, _, _), (profile, seconds, error, workerTimings)) in zip(
+                schematypes, profiles, rendered):
+            if workerTimings:
+                timings.merge(workerTimings)
+            target = os.path.realpath(filename)
+            if target in targets:
+                (profile, error) = (None, ValueError("%s is also the profile of %s" %
+                    (filename, targets[target])))
+            else:
+                targets[target] = schematype
+            unchanged = bool(update and not error and profile is None)
+            future = None
+            if not error and not unchanged:
+                try:
+                    if update or not os.path.exists(filename) or output.resolve(filename, overwrite):
+                        future = writer.submit(filename, profile)
+                    else:
+                        filename = None
+                except OSError as e:
+                    error = e
+            written.append((schematype, filename, seconds, error, unchanged, future))
+    finally:
+        writer.close()
+        if pool:
+            pool.close()
+            pool.join()
+    results = []
+    for (schematype, filename, seconds, error, unchanged, future) in written:
+        if future:
+            try:
+                if future.result():
+                    _logger.log(LOG_ANNOUNCE, "Generated %s" % os.path.abspath(filename))
+                else:
+                    unchanged = True
+            except OSError as e:
+                error = e
+        if error:
+            _logger.error("Failed to generate %s: %s" % (schematype, error))
+        results.append(BatchResult(schematype, filename, seconds, error, unchanged))
+    return results
+
+def printBatchSummary(results, out=sys.stdout):
+    total = 0.0
+    for r in results:
+        total += r.seconds
+        if r.error:
+            outcome = "FAILED: %s" % r.error
+        elif r.unchanged:
+            outcome = "unchanged"
+        elif not r.filename:
+            outcome = "skipped"
+        else:
+            outcome = r.filename
+        out.write("%-40s %8.3fs  %s\n" % (r.schematype, r.seconds, outcome))
+    failed = sum(1 for r in results if r.error)
+    out.write("%d profiles, %d failed, %.3fs total\n" % (len(results), failed, total))
 
 # LOG_ANNOUNCE is above logging.WARNING and always showed
 LOG_LEVELS = [logging.WARNING, logging.INFO, logging.DEBUG, LOG_TRACE]
 
+def _setup(args, versions=()):
+    # Count of -v -v to set logging
+    logging.basicConfig(level=LOG_LEVELS[min(len(LOG_LEVELS)-1, args.verbose)])
+    if args.cache_dir:
+        cache.set_cache_dir(args.cache_dir)
+    if args.profile_timings:
+        timings.enable()
+    # Also load any other versions needed, concurrently
+    contexts = schemaorg.prefetch([args.schemaver] + list(versions),
+        args.offline, args.refresh)
+    schemaorg.set_default_context(contexts[args.schemaver])
+
+def _overwrite(args):
+    """writeToFile() overwrite of --force and --if-exists"""
+    return args.force or args.if_exists
+
+def _batch_types(args, context=None):
+    """Types given as arguments, in --types-file or by --subclasses-of"""
+    schematypes = list(args.schematypes)
+    if args.types_file:
+        schematypes.extend(_read_types(args.types_file))
+    if args.subclasses_of:
+        schematypes.extend(str(c) for c in schemaorg.find_subclasses(args.subclasses_of, context))
+    # Remove duplicates, keeping order
+    return list(OrderedDict.fromkeys(schematypes))
+
+def batch(args=None):
+    """Batch method, generating profiles for many types"""
+    args = parse_batch_args(args)
+    _setup(args)
+    schematypes = _batch_types(args)
+    if not schematypes:
+        _logger.fatal("No schema.org types given")
+        return Status.TYPE_NOT_FOUND
+    results = generate_batch(schematypes, args.output_dir, _overwrite(args), args.jobs,
+        update=args.update)
+    printBatchSummary(results)
+    if any(r.error for r in results):
+        return Status.OTHER_ERROR
+    return Status.OK
+
 def main(args=None):
     """Main method"""
+    if args is None:
+        args = sys.argv[1:]
     try:
-        args = parse_args()
-        # Count of -v -v to set logging
-        logging.basicConfig(level=LOG_LEVELS[min(len(LOG_LEVELS)-1, args.verbose)])
+        if args and args[0] == "batch":
+            return batch(args[1:])
+        if args and args[0] == "diff":
+            from . import diff # imports this module
+            return diff.main(args[1:])
+        if args and args[0] == "usage":
+            from . import usage # imports this module
+            return usage.main(args[1:])
+        args = parse_args(args)
+        _setup(args)
 
         schematype = args.schematype
         assert schematype
         profileName = "profile" in args and args.profile or schematype
         groupName = args.group or profileName
-        schemaorg.set_version(args.schemaver)
-        return generate(schematype, profileName, groupName, args.description, args.output, args.force)
+        generate(schematype, profileName, groupName, args.description, args.output,
+            _overwrite(args), update=args.update)
+        return Status.OK
+    except ValueError as e:
+        # Unknown schema.org type
+        _logger.fatal(e)
+        return Status.UNKNOWN_TYPE
     except OSError as e:
         _logger.fatal(e)
         return Status.IO_ERROR
-
+    finally:
+        if timings.enabled:
+            timings.print_report()
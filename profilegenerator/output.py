@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Write profile files atomically, in the background and only if changed
+
+A profile is written to a temporary file next to its target, synced
+to disk and renamed over the target, so an interrupted run never leaves
+a truncated profile. If the existing file has the same content, apart
+from lines like version_date that differ on every run, it is kept.
+ProfileWriter does this on a pool of threads, so a batch renders the
+next profiles while earlier ones are written, and syncs the directories
+of the renamed files once per group of files rather than once per file.
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import sys
+import errno
+import shutil
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from . import timings
+
+_logger = logging.getLogger(__name__)
+
+# What to do if the output file already exists
+ASK = "ask"
+OVERWRITE = "overwrite"
+SKIP = "skip"
+FAIL = "fail"
+IF_EXISTS = (ASK, OVERWRITE, SKIP, FAIL)
+
+# Threads of ProfileWriter
+WRITE_THREADS = 4
+# Renamed files per sync of their directories
+SYNC_GROUP = 64
+
+# Lines that change on every run, ignored when comparing content
+VOLATILE = ("version_date:",)
+
+def policy(overwrite) -> str:
+    """IF_EXISTS policy of overwrite: True to overwrite, False or None to
+    ask, or the name of a policy"""
+    if overwrite is True:
+        return OVERWRITE
+    if not overwrite:
+        return ASK
+    if overwrite not in IF_EXISTS:
+        raise ValueError("Unknown policy for existing files: %s" % overwrite)
+    return overwrite
+
+def resolve(filename, overwrite) -> bool:
+    """Check if the existing file filename should be overwritten.
+
+    With the ASK policy the user is asked, unless stdin is not a
+    terminal, e.g. in pipelines and cron jobs, when the file is skipped
+    rather than waiting for an answer. Raises FileExistsError with the
+    FAIL policy.
+    """
+    choice = policy(overwrite)
+    if choice == OVERWRITE:
+        return True
+    if choice == FAIL:
+        raise FileExistsError(errno.EEXIST, "File already exists", filename)
+    if choice == SKIP:
+        _logger.info("Skipping existing %s" % filename)
+        return False
+    if sys.stdin is None or not sys.stdin.isatty():
+        _logger.warning("File already exists and not overwritten, as stdin is not "
+            "a terminal to ask: %s" % os.path.abspath(filename))
+        return False
+    _logger.warning("File already exists: %s" % os.path.abspath(filename))
+    while 1:
+        question = 'Overwrite '+ filename + ' (Y/n): '
+        sys.stderr.write(question)
+        answer = input().lower()
+        if answer[:1] == 'y' or answer[:1] == '':
+            return True
+        elif answer[:1] == 'n':
+            break
+        else:
+            sys.stderr.write("Please respond with 'y' or 'n'.\n")
+    _logger.fatal("File %s already exists and not overwritten." % filename)
+    return False
+
+def _digest(text, h=None):
+    h = h or hashlib.sha256()
+    # str.find() is much faster than a multiline regex on large profiles
+    volatile = []
+    for prefix in VOLATILE:
+        at = text.find(prefix)
+        while at >= 0:
+            if at == 0 or text[at-1] == "\n":
+                volatile.append((at, text.find("\n", at) + 1 or len(text)))
+            at = text.find(prefix, at + 1)
+    start = 0
+    for (at, end) in sorted(volatile):
+        h.update(text[start:at].encode("utf-8"))
+        start = end
+    h.update(text[start:].encode("utf-8"))
+    return h
+
+def content_digest(filename) -> str:
+    """Digest of the content of filename, ignoring volatile lines, or
+    None if there is no such file"""
+    try:
+        with open(filename, encoding="utf-8") as f:
+            return _digest(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        _logger.debug("Could not read %s: %s" % (filename, e))
+        return None
+
+def _create_temp(filename):
+    """Create a new temporary file next to filename, returning its
+    descriptor and path. The name is unique, so concurrent writes of
+    filename do not share it, and unlike with mkstemp() the file gets
+    the permissions of open(), as the umask applies."""
+    directory = os.path.dirname(filename)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        tmp = os.path.join(directory, ".%s.%s.tmp" %
+            (os.path.basename(filename), os.urandom(6).hex()))
+        try:
+            return (os.open(tmp, flags, 0o666), tmp)
+        except FileExistsError:
+            continue
+
+def write_atomic(filename, profile, sync=True) -> bool:
+    """Write profile, a string or iterator of strings, to filename.
+
+    The profile is written to a new temporary file in the same directory
+    that replaces filename once complete, keeping the permissions of the
+    file it replaces.
+    Unless the content is the same as the existing file, which is then
+    kept and False returned. With sync the temporary file is flushed to
+    disk before it replaces filename; the directory is not synced, see
+    sync_directories().
+    """
+    h = None
+    if isinstance(profile, str):
+        # Compare before writing anything
+        if content_digest(filename) == _digest(profile).hexdigest():
+            return False
+        profile = [profile]
+    else:
+        h = hashlib.sha256()
+    (fd, tmp) = _create_temp(filename)
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            # profile may be an iterator from streamProfile(),
+            # so this includes rendering
+            for chunk in profile:
+                if h:
+                    # Chunks are whole lines, so volatile lines can be found in each
+                    _digest(chunk, h)
+                f.write(chunk)
+            unchanged = h is not None and content_digest(filename) == h.hexdigest()
+            if sync and not unchanged:
+                f.flush()
+                with timings.phase("fsync"):
+                    os.fsync(f.fileno())
+        if unchanged:
+            os.remove(tmp)
+            return False
+        if os.path.exists(filename):
+            shutil.copymode(filename, tmp)
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return True
+
+def sync_directories(directories):
+    """Sync directories to disk, making renames in them durable"""
+    for directory in directories:
+        try:
+            fd = os.open(directory or ".", os.O_RDONLY)
+        except OSError:
+            # e.g. on Windows, directories can't be opened
+            continue
+        try:
+            with timings.phase("fsync"):
+                os.fsync(fd)
+        except OSError as e:
+            _logger.debug("Could not sync directory %s: %s" % (directory, e))
+        finally:
+            os.close(fd)
+
+class ProfileWriter:
+    """Write profiles with write_atomic() on a pool of threads.
+
+    submit() returns a Future with the result of write_atomic(). The
+    directories of written files are synced for every SYNC_GROUP files
+    and on close(), which waits for all writes. With threads=0 files
+    are written by submit() itself.
+    """
+    def __init__(self, threads=WRITE_THREADS, sync=True):
+        self.sync = sync
+        self._pool = ThreadPoolExecutor(threads) if threads else None
+        self._lock = threading.Lock()
+        self._directories = set()
+        self._written = 0
+
+    def submit(self, filename, profile) -> Future:
+        if self._pool:
+            return self._pool.submit(self._write, filename, profile)
+        future = Future()
+        try:
+            future.set_result(self._write(filename, profile))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _write(self, filename, profile):
+        with timings.phase("write"):
+            written = write_atomic(filename, profile, self.sync)
+        if written and self.sync:
+            with self._lock:
+                self._directories.add(os.path.dirname(filename))
+                self._written += 1
+                if self._written < SYNC_GROUP:
+                    return written
+                (directories, self._directories) = (self._directories, set())
+                self._written = 0
+            sync_directories(directories)
+        return written
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=True)
+        with self._lock:
+            (directories, self._directories) = (self._directories, set())
+            self._written = 0
+        sync_directories(directories)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
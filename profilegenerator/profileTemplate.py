@@ -24,7 +24,7 @@ ghBase = 'https://github.com/BioSchemas/specifications/'
 ghTasksBase = ghBase + 'labels/type%3A%20'
 ghExamplesBase = ghBase + 'tree/master/'
 
-def profileHeader(profileName, schemaType, schemaVersion, isBioschemasType, profileDescription, version, status, groupName, hasLiveDeploy):
+def profileHeader(profileName, schemaType, schemaVersion, isBioschemasType, profileDescription, version, status, groupName, hasLiveDeploy, versionDate=None):
     """
     Generates the YAML for the header section of the profile.
 
@@ -48,6 +48,8 @@ def profileHeader(profileName, schemaType, schemaVersion, isBioschemasType, prof
         The identifying name of the Bioschemas Working Group
     hasLiveDeploy : bool
         Indicates whether there are live deployments available for the profile
+    versionDate : str
+        Timestamp of this version of the profile (default: now, see versionDateNow())
 
     RETURNS
     -------
@@ -70,7 +72,7 @@ def profileHeader(profileName, schemaType, schemaVersion, isBioschemasType, prof
     # TODO: Schema version
     header_properties['description'] = profileDescription
     header_properties['version'] = version
-    header_properties['version_date'] = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    header_properties['version_date'] = versionDate or versionDateNow()
     header_properties['status'] = status
     header_properties['spec_type'] = 'Profile'
     header_properties['group'] = groupName
@@ -81,6 +83,9 @@ def profileHeader(profileName, schemaType, schemaVersion, isBioschemasType, prof
     header_properties['full_example'] = ghExamplesBase + profileName + '/examples/' + version
     return header_properties
 
+def versionDateNow():
+    return datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+
 def profileProperty(propertyName, expectedTypes, schemaDescription, bsDescription, marginality, cardinality, controlledVocabs, example):
     """
     Generates the YAML for a property in the profile.
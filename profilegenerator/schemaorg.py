@@ -16,277 +16,612 @@ __copyright__ = """© 2020 Heriot-Watt University, UK
 __license__ = "MIT" # https://spdx.org/licenses/MIT
 
 from collections import OrderedDict
+from functools import lru_cache
 from typing import TypeVar, List
-from string import Template
+import threading
+from concurrent.futures import Future
+from array import array
 import sys
 
-import rdflib
-from rdflib import Dataset, URIRef
-from rdflib.term import Identifier
-# rdflib knows about some namespaces, like FOAF
-from rdflib.namespace import RDF, RDFS, Namespace
-
-SCHEMA = Namespace("http://schema.org/")
-
 import logging
-from ._logging import LOG_TRACE
+from . import vocabulary
+from . import timings
+from .vocabulary import SCHEMA, SCHEMA_URL, Vocabulary
 
 _logger = logging.getLogger(__name__)
 
-# https://schema.org/docs/developers.html
-SCHEMA_URL=Template("https://schema.org/version/${version}/schemaorg-all-http.jsonld")
-
 SchemaType = TypeVar("SchemaType")
 SchemaProperty = TypeVar("SchemaProperty")
 SchemaClass = TypeVar("SchemaClass")
-
-
-class SchemaType(type):
-    _uri2type = {} 
-    _dataset = rdflib.Dataset()
-    _graph = rdflib.Dataset()
+SchemaContext = TypeVar("SchemaContext")
+Reachability = TypeVar("Reachability")
+
+# Maximum number of schema.org versions kept loaded by get_context()
+MAX_CONTEXTS = 4
+
+
+def _topological(nodes, parents, done=lambda node: False):
+    """Iterate over nodes and their transitive parents, parents first.
+
+    parents[node] are the parents of node. Nodes that are done (e.g.
+    already handled) are not included. Uses Kahn's algorithm rather
+    than recursion, so deep hierarchies are fine.
+    """
+    waiting = OrderedDict() # node -> number of parents not yet yielded
+    children = {}
+    stack = [node for node in reversed(nodes) if not done(node)]
+    while stack:
+        node = stack.pop()
+        if node in waiting:
+            continue
+        waiting[node] = 0
+        for parent in parents[node]:
+            if not done(parent):
+                waiting[node] += 1
+                children.setdefault(parent, []).append(node)
+                stack.append(parent)
+    ready = [node for (node, n) in waiting.items() if not n]
+    ready.reverse()
+    count = 0
+    while ready:
+        node = ready.pop()
+        yield node
+        count += 1
+        for child in children.get(node, ()):
+            waiting[child] -= 1
+            if not waiting[child]:
+                ready.append(child)
+    if count < len(waiting):
+        raise ValueError("Cyclic hierarchy: %s" % 
+            " ".join(str(node) for (node, n) in waiting.items() if n))
+
+def _linearize(head, bases):
+    """C3 linearization of head with bases, like the mro() of a class"""
+    if not bases:
+        return (head,)
+    if len(bases) == 1:
+        return (head,) + bases[0].ancestors
+    sequences = [list(b.ancestors) for b in bases] + [list(bases)]
+    order = [head]
+    while True:
+        sequences = [s for s in sequences if s]
+        if not sequences:
+            return tuple(order)
+        for s in sequences:
+            candidate = s[0]
+            if not any(candidate in other[1:] for other in sequences):
+                break
+        else:
+            raise ValueError("Inconsistent hierarchy of %r: %s" % (head, bases))
+        order.append(candidate)
+        for s in sequences:
+            if s[0] is candidate:
+                del s[0]
+
+
+def _checked(kind, typ):
+    # typ, if it was created as kind
+    if not isinstance(typ, kind):
+        raise ValueError("%s is not a %s" % (typ.uri, kind.__name__))
+    return typ
+
+
+class SchemaContext:
+    """A loaded schema.org version with its own registry of SchemaType views.
+
+    Several contexts (e.g. for schema.org 10.0 and 11.0) can be used side
+    by side; their SchemaClass/SchemaProperty views are separate and know
+    their context. Contexts are safe to share between threads.
+    """
+    def __init__(self, vocab: Vocabulary):
+        self.vocabulary = vocab
+        # vocabulary id -> SchemaType, or None until created
+        self._types = []
+        # (attribute name, id) -> tuple of related SchemaType
+        self._related = {}
+        # re-entrant as creating a type creates its supertypes
+        self._lock = threading.RLock()
+        self._example_categories = None
+        self._reachability = None
+        self.example_value = lru_cache(maxsize=4096)(_example_value)
 
     def __repr__(self):
-        return "<%s>" % self.uri
+        return "<SchemaContext schema.org %s>" % self.version
 
-    def __str__(self):
-        return self.label or self.uri
+    def __getstate__(self):
+        # Types and caches are recreated on demand, e.g. in a worker process
+        return {"vocabulary": self.vocabulary}
 
-    @classmethod
-    def _flush(cls):
-        # Always set in SchemaType
-        SchemaType._uri2type = {} 
-        SchemaType._dataset = rdflib.Dataset()
-        SchemaType._graph = rdflib.Graph()      
+    def __setstate__(self, state):
+        self.__init__(state["vocabulary"])
 
-    #abstract
     @property
-    def label(self):
-        return None # Not implemented
+    def version(self):
+        return self.vocabulary.version
+
+    def as_type(self, kind, uri: str) -> SchemaType:
+        """Find or create the SchemaType (of kind SchemaClass or SchemaProperty) for uri"""
+        uri = str(uri)
+        return self._as_type(kind, self.vocabulary.ids.get(uri), uri)
+
+    def as_types(self, kind, uris) -> List[SchemaType]:
+        """as_type() of several uris, creating missing types in one go"""
+        with self._lock:
+            return [self._types[i] for i in self._materialize(kind, [str(uri) for uri in uris])]
+
+    def _as_type(self, kind, i, uri=None) -> SchemaType:
+        # as_type() of vocabulary id i, or of uri if not in the vocabulary
+        with self._lock:
+            if i is not None and i < len(self._types) and self._types[i] is not None:
+                timings.count("uri2type_hits")
+                return _checked(kind, self._types[i])
+            timings.count("uri2type_misses")
+            uri = uri or self.vocabulary.uris[i]
+            return self._types[self._materialize(kind, (uri,))[0]]
+
+    def materialize(self, classes=True, properties=True):
+        """Create all SchemaClass and/or SchemaProperty types up front.
+
+        Cheaper than creating them one by one when most types will be
+        used, e.g. to generate profiles for every schema.org class.
+        """
+        vocab = self.vocabulary
+        with self._lock:
+            with timings.phase("materialize"):
+                if classes:
+                    self._materialize(SchemaClass,
+                        [vocab.uris[i] for i in vocab.terms(vocab.CLASS)])
+                if properties:
+                    self._materialize(SchemaProperty,
+                        [vocab.uris[i] for i in vocab.terms(vocab.PROPERTY)])
+
+    def _materialize(self, kind, uris):
+        # Create types of kind for uris and their missing supertypes,
+        # supertypes first, returning the ids of uris. Caller holds self._lock
+        vocab = self.vocabulary
+        ids = []
+        for uri in uris:
+            i = vocab.ids.get(uri)
+            if i is None:
+                if not kind._exists(uri, self):
+                    raise ValueError("%s is not a known %s" % (uri, kind))
+                i = vocab.add(uri)
+            ids.append(i)
+        types = self._types
+        if len(types) < len(vocab.uris):
+            types.extend([None] * (len(vocab.uris) - len(types)))
+        for i in _topological(ids, vocab.supertypes, lambda i: types[i] is not None):
+            uri = vocab.uris[i]
+            if not kind._exists(uri, self):
+                raise ValueError("%s is not a known %s" % (uri, kind))
+            # create same subclass (SchemaProperty or SchemaClass)
+            bases = [types[sup] for sup in vocab.supertypes[i]]
+            types[i] = kind._new(i, bases, self)
+        for i in ids:
+            # e.g. a property requested as a class
+            _checked(kind, types[i])
+        return ids
+
+    def related(self, name, typ, kind) -> tuple:
+        """SchemaType of kind for the ids in vocabulary column name of typ,
+        e.g. ("rangeIncludes", SchemaProperty, SchemaClass). Cached."""
+        key = (name, typ.id)
+        found = self._related.get(key)
+        if found is None:
+            found = self._related[key] = tuple(self._as_type(kind, o) for o in 
+                getattr(self.vocabulary, name)[typ.id])
+        return found
+
+    def inherited(self, name, typ) -> tuple:
+        """Union of related(name) over ancestors of typ, in mro order. Cached."""
+        key = (name + "WithSuper", typ.id)
+        found = self._related.get(key)
+        if found is None:
+            merged = OrderedDict()
+            for k in typ.ancestors:
+                for o in getattr(k, name):
+                    merged[o] = o
+            found = self._related[key] = tuple(merged)
+        return found
+
+    def example_category(self, uri: str) -> str:
+        """Find the EXAMPLE_CATEGORIES name of class uri, or None for other datatypes"""
+        if self._example_categories is None:
+            self._example_categories = _example_categories(self.reachability)
+        return self._example_categories.get(uri)
 
-    @classmethod
-    def dataset(cls, schemaver="latest"):
-        if cls._dataset:
-            return cls._dataset
-        url = SCHEMA_URL.substitute(version=schemaver)
-        _logger.info("Loading %s as RDF Dataset" % url)
-        d = rdflib.Dataset()
-        result = d.parse(url, format="json-ld")
-        _logger.info("Loaded %s quads" % len(d))
-        if _logger.isEnabledFor(LOG_TRACE):
-            _logger.log(LOG_TRACE, d.serialize(format="trig").decode("utf-8"))
-        # NOTE: Store it in this parent class to support _reset
-        SchemaType._dataset = d
-        return cls._dataset
+    @property
+    def reachability(self) -> Reachability:
+        """Transitive closure of the vocabulary's supertypes, built on first use"""
+        if self._reachability is None:
+            with self._lock:
+                if self._reachability is None:
+                    with timings.phase("reachability"):
+                        self._reachability = Reachability(self.vocabulary)
+        return self._reachability
+
+
+class Reachability:
+    """Transitive closure of rdfs:subClassOf and rdfs:subPropertyOf.
+
+    The ancestors and descendants of each term are bitsets: Python ints
+    with a bit per term, so checking if a term is a subtype of another
+    is a single bit test (see _example_categories()), and queries over
+    many terms combine whole rows with bitwise operations rather than
+    walking the hierarchy per term (see find_subclasses()).
+    Terms with subtypes are numbered first, keeping the bitsets of
+    ancestors small; use mask() and ids() to
+    convert from and to vocabulary ids. Terms added to the
+    vocabulary later, which have no supertypes, only reach themselves.
+    """
+    def __init__(self, vocab: Vocabulary):
+        self.vocabulary = vocab
+        self.size = n = len(vocab.uris)
+        # Read once, as columns of a mapped vocabulary are decoded on access
+        supertypes = list(vocab.supertypes)
+        inner = bytearray(n)
+        for sups in supertypes:
+            for sup in sups:
+                inner[sup] = 1
+        # Terms with subtypes first, then the other terms in the
+        # hierarchy, then those without supertypes or subtypes
+        hierarchy = list(_topological([i for i in range(n) if supertypes[i]], supertypes))
+        order = [i for i in hierarchy if inner[i]]
+        order.extend(i for i in hierarchy if not inner[i])
+        order.extend(i for i in range(n) if not inner[i] and not supertypes[i])
+        self._order = array("I", order)
+        self._bit = bit = array("I", bytes(4 * n))
+        for (b, i) in enumerate(order):
+            bit[i] = b
+        # Strict ancestors by id, the term's own bit is added when queried
+        self._up = up = [0] * n
+        for i in hierarchy:
+            mask = 0
+            for sup in supertypes[i]:
+                mask |= up[sup] | 1 << bit[sup]
+            up[i] = mask
+        # Strict descendants by id, see descendants()
+        self._down = None
+
+    def bit(self, i: int) -> int:
+        """Bit number of vocabulary id i"""
+        return self._bit[i] if i < self.size else i
+
+    def mask(self, ids) -> int:
+        """Bitset of vocabulary ids"""
+        mask = 0
+        for i in ids:
+            mask |= 1 << self.bit(i)
+        return mask
+
+    def ids(self, mask: int) -> List[int]:
+        """Vocabulary ids of the bits set in mask, sorted"""
+        order = self._order
+        return sorted(order[bit] if bit < self.size else bit
+            for (bit, c) in enumerate(reversed(bin(mask)[2:])) if c == "1")
+
+    def ancestors(self, i: int) -> int:
+        """Bitset of i and its transitive supertypes"""
+        if i >= self.size:
+            return 1 << i
+        return self._up[i] | 1 << self._bit[i]
+
+    def descendants(self, i: int) -> int:
+        """Bitset of i and its transitive subtypes"""
+        if i >= self.size:
+            return 1 << i
+        if self._down is None:
+            # Only built if needed, as the bitsets of terms near the root are large
+            down = [0] * self.size
+            supertypes = self.vocabulary.supertypes
+            for t in reversed(self._order):
+                sups = supertypes[t]
+                if sups:
+                    mask = down[t] | 1 << self._bit[t]
+                    for sup in sups:
+                        down[sup] |= mask
+            self._down = down
+        return self._down[i] | 1 << self._bit[i]
+
+
+class SchemaType:
+    """Thin view of a term in the vocabulary of its context.
+
+    There is one view per term and context, so they can be compared
+    by identity. ancestors are in C3 (mro) order, like Python classes.
+    """
+    __slots__ = ("context", "id", "uri", "ancestors")
+
+    def __init__(self, context: SchemaContext, id: int, bases: List[SchemaType]=()):
+        self.context = context
+        self.id = id
+        self.uri = context.vocabulary.uris[id]
+        self.ancestors = _linearize(self, bases)
 
-    @classmethod
-    def graph(cls):
-        """Find schema.org named graph"""
-        if cls._graph:
-            return cls._graph
-        for (s,p,o,g) in cls.dataset().quads([SCHEMA.Thing,RDF.type,RDFS.Class,None]):
-            # Found the named graph of schema.org declarations
-            SchemaType._graph = cls.dataset().graph(g)
-        return cls._graph
+    def __repr__(self):
+        return "<%s>" % self.uri
 
-    @classmethod
-    def version(cls):
-        return cls.graph().identifier.replace("http://schema.org/#", "")
+    def __str__(self):
+        return self.label or self.uri
 
     @classmethod
-    def as_type(cls, uri: URIRef) -> SchemaType:
-        if uri not in cls._uri2type:
-            if not cls._exists(uri):
-                raise ValueError("%s is not a known %s" % (uri, cls))
-            # create same subclass (SchemaProperty or SchemaClass)
-            cls._uri2type[uri] = cls._new(uri)
-        return cls._uri2type[uri]
+    def as_type(cls, uri: str, context: SchemaContext=None) -> SchemaType:
+        return (context or default_context()).as_type(cls, uri)
 
     @classmethod
-    def _new(cls, uri: URIRef) -> SchemaType:
-        cls._uri2type[uri] = None # pre-reserve to avoid loops
-        _logger.debug("Creating %s for %s" % (cls,uri))
-        uri = uri
-        bases = tuple(cls._supertypes(uri))
+    def _new(cls, id: int, bases: List[SchemaType], context: SchemaContext) -> SchemaType:
+        """Create type for vocabulary id, with bases its SchemaType supertypes.
+        Use context.as_type() rather than calling directly."""
+        _logger.debug("Creating %s for %s" % (cls.__name__, context.vocabulary.uris[id]))
+        # Drop bases already inherited through another base, e.g. 
+        # Course is both CreativeWork and LearningResource (a CreativeWork),
+        # which would otherwise give an inconsistent MRO
+        bases = tuple(b for b in bases 
+            if not any(o is not b and b in o.ancestors for o in bases))
         _logger.debug("..with bases %s" % (bases,))
-        C = cls(uri, bases, {"uri": uri})
-        cls._uri2type[uri] = C # self-register
-        _logger.debug("Mapped %s to %s" % (uri, C))
-        return C
-
-    # abstract
-    @classmethod
-    def _supertypes(cls, uri: URIRef):
-        return []
+        with timings.phase("new_type"):
+            return cls(context, id, bases)
 
     @classmethod
-    def _exists(cls, uri: URIRef) -> bool:
+    def _exists(cls, uri: str, context: SchemaContext) -> bool:
         # Accept any non-schema.org terms like rdf:type
-        return not uri.startswith("http://schema.org/")
+        return not uri.startswith(SCHEMA)
 
     @property
     def supertypes(self):
-        return list(self._supertypes(self.uri))
-
-    @property
-    def ancestors(self):
-        return [p for p in self.mro() if isinstance(p, SchemaType)]
+        return self.context.related("supertypes", self, type(self))
 
     @property
     def label(self):
-        for label in self.graph().objects(self.uri, RDFS.label):
-            return str(label) # usually only one!
-        return None
+        return self.context.vocabulary.labels[self.id]
 
     @property            
     def comment(self):
-        for comment in self.graph().objects(self.uri, RDFS.comment):
-            return str(comment)
-        return None
+        return self.context.vocabulary.comments[self.id]
 
 class SchemaProperty(SchemaType):
+    __slots__ = ()
+
     @classmethod
-    def _exists(cls, uri: URIRef) -> bool:
+    def _exists(cls, uri: str, context: SchemaContext) -> bool:
         _logger.debug("Checking property %s" % uri)
-        return super()._exists(uri) or (uri, RDF.type, RDF.Property) in cls.graph()
+        return (super()._exists(uri, context) or 
+            bool(context.vocabulary.kind(uri) & Vocabulary.PROPERTY))
 
-    @classmethod    
-    def _supertypes(self, uri: URIRef):
-        return map(SchemaProperty.as_type, 
-            self.graph().objects(uri, RDFS.subPropertyOf))
-    
     @property
     def domainIncludes(self):
-        return [SchemaClass.as_type(o) for o in
-            self.graph().objects(self.uri, SCHEMA.domainIncludes)]
+        return self.context.related("domainIncludes", self, SchemaClass)
 
     def domainIncludesWithSuper(self):
-        classes = OrderedDict()
-        for p in self.ancestors: # use mro order
-            for k in p.domainIncludes:
-                classes[k] = k
-        return list(classes.keys())
+        return self.context.inherited("domainIncludes", self)
 
     def rangeIncludesWithSuper(self):
-        classes = OrderedDict()
-        for p in self.ancestors: # use mro order
-            for k in p.rangeIncludes:
-                classes[k] = k
-        return list(classes.keys())
+        return self.context.inherited("rangeIncludes", self)
 
     @property
     def rangeIncludes(self) -> SchemaClass:
-        return [SchemaClass.as_type(o) for o in 
-            self.graph().objects(self.uri, SCHEMA.rangeIncludes)]
+        return self.context.related("rangeIncludes", self, SchemaClass)
 
 class SchemaClass(SchemaType):
-    @classmethod
-    def _exists(cls, uri: URIRef) -> bool:
-        return super()._exists(uri) or (uri, RDF.type, RDFS.Class) in cls.graph()
+    __slots__ = ()
 
     @classmethod
-    def _supertypes(cls, uri: URIRef):
-        return map(SchemaClass.as_type, 
-            cls.graph().objects(uri, RDFS.subClassOf)) 
+    def _exists(cls, uri: str, context: SchemaContext) -> bool:
+        return (super()._exists(uri, context) or 
+            bool(context.vocabulary.kind(uri) & Vocabulary.CLASS))
 
     @property
     def includedInDomainOf(self):
-        a = [SchemaProperty.as_type(s) for s in
-            self.graph().subjects(SCHEMA.domainIncludes, self.uri)]
-        a.sort(key=str)
-        return a
+        # Already sorted by str(SchemaProperty)
+        return self.context.related("includedInDomainOf", self, SchemaProperty)
 
     def includedInDomainOfWithSuper(self):
-        props = OrderedDict()
-        for k in self.ancestors: # use mro order
-            for p in k.includedInDomainOf:
-                props[p] = p
-        return list(props.keys())
+        return self.context.inherited("includedInDomainOf", self)
 
     @property
     def includedInRangeOf(self) -> SchemaProperty:
-        return [SchemaProperty.as_type(s) for s in 
-            self.graph().subjects(SCHEMA.rangeIncludes, self.uri)]
+        return self.context.related("includedInRangeOf", self, SchemaProperty)
 
     def includedInRangeOfWithSuper(self):
-        props = OrderedDict()
-        for k in self.ancestors: # use mro order
-            for p in k.includedInRangeOf:
-                props[p] = p
-        return list(props.keys())
-
-def find_class(schematype):
-    if not isinstance(schematype, Identifier):
+        return self.context.inherited("includedInRangeOf", self)
+
+def find_class(schematype, context: SchemaContext=None):
+    if not schematype.startswith(SCHEMA):
         schematype = SCHEMA[schematype]
-    return SchemaClass.as_type(schematype)
+    return SchemaClass.as_type(schematype, context)
 
-def find_property(schemaprop):
-    if not isinstance(schemaprop, Identifier):
+def find_property(schemaprop, context: SchemaContext=None):
+    if not schemaprop.startswith(SCHEMA):
         schemaprop = SCHEMA[schemaprop]
-    return SchemaProperty.as_type(schemaprop)
-
-def find_properties(schematype):
-    s = find_class(schematype)
-    type_properties = OrderedDict()
-    for schematype in s.ancestors:
-        type_properties[schematype] = schematype.includedInDomainOf
-    return type_properties
-
-def get_version():
-    return SchemaType.version()
-
-def set_version(version):
-    SchemaType._flush()
-    SchemaType.dataset(version)
-
-
-def make_example_value(s_type: SchemaClass, prop: SchemaProperty, 
-                 expectedType: SchemaClass) -> str:
-    example_id = "https://example.com/%s/123" % str(s_type).lower()
-    if not expectedType: 
-        exampleValue = '""'
-    # Note: We'll only inspect the FIRST type in range
-    elif issubclass(expectedType, find_class(SCHEMA.URL)):
+    return SchemaProperty.as_type(schemaprop, context)
+
+def find_properties(schematype, context: SchemaContext=None):
+    with timings.phase("find_properties"):
+        s = find_class(schematype, context)
+        type_properties = OrderedDict()
+        for schematype in s.ancestors:
+            type_properties[schematype] = schematype.includedInDomainOf
+        return type_properties
+
+def find_subclasses(schematype, context: SchemaContext=None):
+    """Find schematype and all its (transitive) schema.org subclasses"""
+    s = find_class(schematype, context)
+    vocab = s.context.vocabulary
+    reach = s.context.reachability
+    classes = [i for i in reach.ids(reach.descendants(s.id))
+        if vocab.kinds[i] & vocab.CLASS]
+    # Only the subclasses need to be created
+    return sorted(s.context.as_types(SchemaClass, [vocab.uris[i] for i in classes]), key=str)
+
+_contexts = OrderedDict()
+# schemaver -> Future of the SchemaContext being loaded by another thread
+_loading = {}
+_contexts_lock = threading.Lock()
+_default_context = None
+
+def get_context(schemaver="latest", offline=False, refresh=False) -> SchemaContext:
+    """Find or load the SchemaContext of a schema.org version.
+
+    At most MAX_CONTEXTS versions are kept loaded, evicting the least
+    recently used. Contexts still in use elsewhere remain usable.
+    """
+    return prefetch([schemaver], offline, refresh)[schemaver]
+
+def _add_context(schemaver, vocab) -> SchemaContext:
+    # Caller holds _contexts_lock
+    context = _contexts[schemaver] = SchemaContext(vocab)
+    _contexts.move_to_end(schemaver)
+    while len(_contexts) > MAX_CONTEXTS:
+        (evicted, _) = _contexts.popitem(last=False)
+        _logger.info("Unloaded schema.org %s" % evicted)
+    return context
+
+def prefetch(versions, offline=False, refresh=False):
+    """Load several schema.org versions, downloading those not cached
+    concurrently. Returns their SchemaContext by version.
+
+    Versions are loaded without holding _contexts_lock, so loaded
+    versions are available meanwhile. A version already being loaded
+    by another thread is waited for rather than loaded again.
+    """
+    contexts = OrderedDict.fromkeys(versions)
+    (missing, waiting) = (OrderedDict(), {})
+    with _contexts_lock:
+        for schemaver in contexts:
+            if schemaver in _contexts and not refresh:
+                _contexts.move_to_end(schemaver)
+                contexts[schemaver] = _contexts[schemaver]
+            elif schemaver in _loading:
+                waiting[schemaver] = _loading[schemaver]
+            else:
+                missing[schemaver] = _loading[schemaver] = Future()
+    if missing:
+        try:
+            vocabs = vocabulary.load_all(list(missing), offline, refresh)
+        except BaseException as e:
+            with _contexts_lock:
+                for (schemaver, future) in missing.items():
+                    del _loading[schemaver]
+                    future.set_exception(e)
+            raise
+        with _contexts_lock:
+            for (schemaver, future) in missing.items():
+                contexts[schemaver] = _add_context(schemaver, vocabs[schemaver])
+                del _loading[schemaver]
+                future.set_result(contexts[schemaver])
+    for (schemaver, future) in waiting.items():
+        contexts[schemaver] = future.result()
+    return contexts
+
+def loaded_contexts():
+    """Currently loaded contexts by requested schema.org version"""
+    with _contexts_lock:
+        return OrderedDict(_contexts)
+
+def default_context() -> SchemaContext:
+    """Context used when none is given, by default "latest" schema.org"""
+    global _default_context
+    if _default_context is None:
+        _default_context = get_context()
+    return _default_context
+
+def set_default_context(context: SchemaContext):
+    global _default_context
+    _default_context = context
+
+def get_version(context: SchemaContext=None):
+    return (context or default_context()).version
+
+def set_version(version, offline=False, refresh=False) -> SchemaContext:
+    """Load schema.org version and make it the default context"""
+    context = get_context(version, offline, refresh)
+    set_default_context(context)
+    return context
+
+def set_vocabulary(vocab: Vocabulary) -> SchemaContext:
+    """Use an already loaded Vocabulary as the default context"""
+    context = SchemaContext(vocab)
+    set_default_context(context)
+    return context
+
+
+# Datatype categories for example values, in order of precedence.
+# Note: an expected type of Thing itself is in the "Thing" category.
+EXAMPLE_CATEGORIES = (
+    ("URL", SCHEMA.URL),
+    ("Person", SCHEMA.Person),
+    ("Intangible", SCHEMA.Intangible),
+    ("Thing", SCHEMA.Thing),
+    ("DateTime", SCHEMA.DateTime),
+    ("Date", SCHEMA.Date),
+    ("Time", SCHEMA.Time),
+    ("Boolean", SCHEMA.Boolean),
+    ("Number", SCHEMA.Number),
+    ("Text", SCHEMA.Text),
+)
+
+def _example_categories(reach: Reachability):
+    """Map every class of the vocabulary to its EXAMPLE_CATEGORIES name"""
+    vocab = reach.vocabulary
+    roots = [(category, reach.mask([vocab.ids[root]]))
+        for (category, root) in EXAMPLE_CATEGORIES if root in vocab.ids]
+    categories = {}
+    for i in vocab.terms(vocab.CLASS):
+        ancestors = reach.ancestors(i)
+        for (category, root) in roots:
+            if ancestors & root:
+                categories[vocab.uris[i]] = category
+                break
+    return categories
+
+def _example_value(prop: SchemaProperty, expectedType: SchemaClass) -> str:
+    # Memoized per context as SchemaContext.example_value
+    category = expectedType.context.example_category(expectedType.uri)
+    if category == "URL":
         # Some identifier - possibly related to property name
-        exampleValue = '"https://purl.example.org/%s-345"' % str(prop).lower()
-    elif issubclass(expectedType, find_class(SCHEMA.Person)):
+        return '"https://purl.example.org/%s-345"' % str(prop).lower()
+    elif category == "Person":
         # Specified type of object
-        exampleValue = '{"@id": "https://orcid.org/0000-0002-1825-0097", "@type": "%s"}' % (
+        return '{"@id": "https://orcid.org/0000-0002-1825-0097", "@type": "%s"}' % (
             str(expectedType))            
-    elif issubclass(expectedType, find_class(SCHEMA.Intangible)):
+    elif category == "Intangible":
         # Usually anonymous, e.g. PropertyValue
-        exampleValue = '{"@type": "%s"}' % (
+        return '{"@type": "%s"}' % (
             str(expectedType))
-    elif issubclass(expectedType, find_class(SCHEMA.Thing)):
+    elif category == "Thing":
         # Specified type of object
-        exampleValue = '{"@id": "https://example.com/%s/345", "@type": "%s"}' % (
+        return '{"@id": "https://example.com/%s/345", "@type": "%s"}' % (
             str(expectedType).lower(), str(expectedType))            
-    elif expectedType.uri == SCHEMA.Thing:
-        # Unknown/any type - generic object
-        exampleValue = '{"@id": "https://example.org/345"}'
-    elif issubclass(expectedType, find_class(SCHEMA.DateTime)):
-        exampleValue = '"2020-10-08T17:33:08+01:00"'
-    elif issubclass(expectedType, find_class(SCHEMA.Date)):
-        exampleValue = '"2020-10-08"'
-    elif issubclass(expectedType, find_class(SCHEMA.Time)):
-        exampleValue = '"17:33:08"'
-    elif issubclass(expectedType, find_class(SCHEMA.Boolean)):
-        exampleValue = 'false'
-    elif issubclass(expectedType, find_class(SCHEMA.Number)):
-        exampleValue = '123'
-    elif issubclass(expectedType, find_class(SCHEMA.Text)):
-        exampleValue = '"example %s"' % str(prop).lower()
+    elif category == "DateTime":
+        return '"2020-10-08T17:33:08+01:00"'
+    elif category == "Date":
+        return '"2020-10-08"'
+    elif category == "Time":
+        return '"17:33:08"'
+    elif category == "Boolean":
+        return 'false'
+    elif category == "Number":
+        return '123'
+    elif category == "Text":
+        return '"example %s"' % str(prop).lower()
     else:
         # Probably a datatype, fallback to empty string
-        exampleValue = '""'
-    return exampleValue
+        return '""'
+
+def make_example_value(s_type: SchemaClass, prop: SchemaProperty, 
+                 expectedType: SchemaClass) -> str:
+    if not expectedType: 
+        return '""'
+    # Note: We'll only inspect the FIRST type in range
+    return expectedType.context.example_value(prop, expectedType)
 
 def make_example_property(s_type: SchemaClass, prop: SchemaProperty, 
                  expectedType: SchemaClass) -> str:
     example_id = "https://example.com/%s/123" % str(s_type).lower()
     _logger.info("Making example for [a %s] %s [a %s]" % (s_type, prop, expectedType))
-    exampleValue = make_example_value(s_type, prop, expectedType)
-    ex = '''{ "@context": "https://schema.org/",
+    with timings.phase("example"):
+        exampleValue = make_example_value(s_type, prop, expectedType)
+        ex = '''{ "@context": "https://schema.org/",
   "@id": "%s",
   "@type": "%s",
   "%s": %s
@@ -312,21 +647,27 @@ def make_example_class(s_type: SchemaClass, properties: List[SchemaProperty]) ->
     _logger.debug(ex)
     return ex
 
+def make_examples(term, context: SchemaContext=None) -> List[str]:
+    """Examples for a schema.org class or property name, as shown by main()"""
+    if term[0] == term[0].upper(): # assume is Class
+        k = find_class(term, context)
+        return [make_example_class(k, k.includedInDomainOfWithSuper())]
+    else: # assume is property
+        p = find_property(term, context) 
+        return [make_example_property(d,p,r)
+            for d in p.domainIncludesWithSuper()
+            for r in p.rangeIncludesWithSuper()]
+
 def main(args=None):
     """Show example for a particular thing"""
     if not args:
         args = sys.argv[1:]
+    if args and args[0] == "corpus":
+        from . import corpus
+        return corpus.main(args[1:])
     if not args or "-h" in args or "--help" in args:
         print("schemaorg-example [TYPE-or-PROPERTY]")
+        print("schemaorg-example corpus [-h] [-O DIR] [-j N] ..")
         return
-    term = args[0]
-    if term[0] == term[0].upper(): # assume is Class
-        k = find_class(term)
-        ex = make_example_class(k, k.includedInDomainOfWithSuper())
+    for ex in make_examples(args[0]):
         print(ex)
-    else: # assume is property
-        p = find_property(term) 
-        for d in p.domainIncludesWithSuper():
-            for r in p.rangeIncludesWithSuper():
-                ex = make_example_property(d,p,r)
-                print(ex)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Profile generation server keeping schema.org vocabularies loaded
+
+    GET /profile/TYPE[?profile=..&group=..&description=..&schemaver=..]
+    GET /example/TYPE-or-PROPERTY[?schemaver=..]
+    GET /versions
+    GET /timings  (with --profile-timings)
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import json
+import logging
+import argparse
+import threading
+import socketserver
+import urllib.parse
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from ._version import __version__
+from ._logging import LOG_ANNOUNCE
+from . import schemaorg
+from . import cache
+from . import timings
+from .main import renderProfile, renderMapping, LOG_LEVELS
+
+_logger = logging.getLogger(__name__)
+
+
+class ProfileService:
+    """Render profiles and examples from loaded schema.org versions.
+
+    Each version is a separate schemaorg.SchemaContext, so requests for
+    different versions are handled concurrently. At most
+    schemaorg.MAX_CONTEXTS versions are kept loaded.
+
+    The rendered mapping section of recent profiles is kept, as only
+    the profile header varies between requests for the same type.
+    """
+    def __init__(self, defaultVersion="latest", offline=False, maxMappings=256):
+        self.defaultVersion = defaultVersion
+        self.offline = offline
+        self.maxMappings = maxMappings
+        self._mappings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def context(self, schemaver=None):
+        """Find or load SchemaContext of schemaver"""
+        schemaver = schemaver or self.defaultVersion
+        context = schemaorg.get_context(schemaver, self.offline)
+        _logger.debug("Using %r for %s" % (context, schemaver))
+        return context
+
+    def _mapping(self, schemaver, schematype, context):
+        key = (schemaver or self.defaultVersion, schematype)
+        with self._lock:
+            if key in self._mappings:
+                self._mappings.move_to_end(key)
+                return self._mappings[key]
+        # Render outside the lock; a concurrent duplicate is harmless
+        mapping = renderMapping(schematype, context)
+        with self._lock:
+            self._mappings[key] = mapping
+            if len(self._mappings) > self.maxMappings:
+                self._mappings.popitem(last=False)
+        return mapping
+
+    def profile(self, schematype, schemaver=None, **kwargs):
+        context = self.context(schemaver)
+        mapping = self._mapping(schemaver, schematype, context)
+        return renderProfile(schematype, mapping=mapping, context=context, **kwargs)
+
+    def examples(self, term, schemaver=None):
+        context = self.context(schemaver)
+        return "\n".join(schemaorg.make_examples(term, context)) + "\n"
+
+    def versions(self):
+        return {v: context.version for (v, context) in 
+            schemaorg.loaded_contexts().items()}
+
+
+class ProfileRequestHandler(BaseHTTPRequestHandler):
+    server_version = "bioschemas-profilegen/" + __version__
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        path = [urllib.parse.unquote(p) for p in url.path.strip("/").split("/")]
+        service = self.server.service
+        try:
+            if len(path) == 2 and path[0] == "profile" and path[1]:
+                body = service.profile(path[1], query.get("schemaver"),
+                    profileName=query.get("profile"), groupName=query.get("group"),
+                    description=query.get("description"))
+                self._respond(HTTPStatus.OK, "text/html", body)
+            elif len(path) == 2 and path[0] == "example" and path[1]:
+                body = service.examples(path[1], query.get("schemaver"))
+                self._respond(HTTPStatus.OK, "text/plain", body)
+            elif path == ["versions"]:
+                body = json.dumps(service.versions(), indent=2) + "\n"
+                self._respond(HTTPStatus.OK, "application/json", body)
+            elif path == ["timings"] and timings.enabled:
+                body = json.dumps(timings.report(), indent=2) + "\n"
+                self._respond(HTTPStatus.OK, "application/json", body)
+            else:
+                self.send_error(HTTPStatus.NOT_FOUND, "Unknown endpoint")
+        except ValueError as e:
+            # Unknown schema.org term, or a property as profile type
+            self.send_error(HTTPStatus.NOT_FOUND, str(e))
+        except OSError as e:
+            # Includes cache.CacheMiss
+            _logger.error(e)
+            self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+
+    def _respond(self, status, contentType, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", contentType + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # client_address is empty for Unix sockets
+        return self.client_address and self.client_address[0] or "unix"
+
+    def log_message(self, format, *args):
+        _logger.info("%s %s" % (self.address_string(), format % args))
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+if hasattr(socketserver, "UnixStreamServer"): # Not on Windows
+    class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def make_server(service, host="localhost", port=8765, socket=None):
+    if socket:
+        if os.path.exists(socket):
+            os.remove(socket)
+        server = ThreadingUnixHTTPServer(socket, ProfileRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ProfileRequestHandler)
+    server.service = service
+    return server
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(prog="bioschemas-profilegen-server",
+        description='Serve Bioschemas.org profile templates over HTTP, keeping schema.org loaded')
+    parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+        help='Increase verbosity level. Repeat -v for debug and trace logs')
+    parser.add_argument("--host", default="localhost",
+        help="Host name or address to listen on (default: %(default)s)")
+    parser.add_argument("--port", "-p", type=int, default=8765,
+        help="TCP port to listen on (default: %(default)s)")
+    parser.add_argument("--socket", metavar="PATH", default=None,
+        help="Listen on Unix socket PATH instead of TCP")
+    parser.add_argument("--schemaver", "-s", metavar="VERSION", action="append",
+        help='schema.org version to preload, can be repeated. The first is the default (default: "latest")')
+    parser.add_argument("--max-versions", metavar="N", type=int, default=schemaorg.MAX_CONTEXTS,
+        help="Maximum number of schema.org versions kept loaded (default: %(default)s)")
+    parser.add_argument("--offline", action="store_true",
+        help="Only use the local schema.org cache; fail if VERSION is not cached")
+    parser.add_argument("--cache-dir", metavar="DIR", default=None,
+        help="schema.org cache directory (default: %s)" % cache.default_cache_dir())
+    parser.add_argument("--profile-timings", action="store_true",
+        help="Record time spent per phase, served as /timings and printed at exit")
+    return parser.parse_args(args)
+
+def main(args=None):
+    """Run server until interrupted"""
+    args = parse_args(args)
+    logging.basicConfig(level=LOG_LEVELS[min(len(LOG_LEVELS)-1, args.verbose)])
+    if args.cache_dir:
+        cache.set_cache_dir(args.cache_dir)
+    if args.profile_timings:
+        timings.enable()
+    schemaorg.MAX_CONTEXTS = max(args.max_versions, 1)
+    versions = args.schemaver or ["latest"]
+    service = ProfileService(versions[0], args.offline)
+    for context in schemaorg.prefetch(versions, args.offline).values():
+        _logger.log(LOG_ANNOUNCE, "Loaded %r" % context)
+    server = make_server(service, args.host, args.port, args.socket)
+    _logger.log(LOG_ANNOUNCE, "Serving on %s" % (args.socket or
+        "http://%s:%s/" % server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if timings.enabled:
+            timings.print_report()
+    return 0
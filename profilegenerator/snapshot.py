@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Read-only binary snapshot of a Vocabulary, used through mmap
+
+Opening a snapshot only maps the file, and lookups read straight from
+the mapped pages, so processes using the same cached schema.org
+version share one copy of it and start without unpickling.
+
+Layout, in native byte order and with 8-byte aligned sections:
+
+    header      MAGIC, FORMAT, byte order mark, term and string counts,
+                then (offset, length) of each section below
+    version     UTF-8 schema.org version
+    strings     offsets (uint32, count + 1) and UTF-8 data of all URIs,
+                labels and comments
+    terms       records of uint32 (uri, label, comment, kind), with
+                strings as index in the string table or NONE
+    relations   per Vocabulary.RELATIONS column: offsets (uint32,
+                terms + 1) into a uint32 array of related term ids
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import mmap
+import struct
+import bisect
+import itertools
+from array import array
+
+from .vocabulary import Vocabulary
+
+MAGIC = b"PGVOCAB\0"
+# Bump when the layout changes
+FORMAT = 1
+BYTE_ORDER_MARK = 0x01020304
+# Missing label or comment
+NONE = 0xFFFFFFFF
+# Slot of a string not yet decoded, see _Strings
+_UNDECODED = object()
+# Fields of a term record
+(URI, LABEL, COMMENT, KIND) = range(4)
+RECORD_SIZE = 4
+
+SECTIONS = ("version", "string_offsets", "string_data", "terms") + tuple(
+    "%s_%s" % (name, part) for name in Vocabulary.RELATIONS
+    for part in ("offsets", "ids"))
+HEADER = struct.Struct("=8sHIII" + "QQ" * len(SECTIONS))
+
+def _uint32(values=()):
+    a = array("I", values)
+    assert a.itemsize == 4
+    return a
+
+def write(vocab: Vocabulary, f):
+    """Write snapshot of vocab to binary file f"""
+    strings = {}
+    def string(s):
+        if s is None:
+            return NONE
+        return strings.setdefault(s, len(strings))
+    terms = _uint32()
+    for i in range(len(vocab.uris)):
+        terms.extend((string(vocab.uris[i]), string(vocab.labels[i]),
+            string(vocab.comments[i]), vocab.kinds[i]))
+    stringOffsets = _uint32([0])
+    stringData = bytearray()
+    for s in strings: # in order of index
+        stringData += s.encode("utf-8")
+        stringOffsets.append(len(stringData))
+    sections = [vocab.version.encode("utf-8"), stringOffsets.tobytes(),
+        bytes(stringData), terms.tobytes()]
+    for name in Vocabulary.RELATIONS:
+        offsets = _uint32([0])
+        ids = _uint32()
+        for related in getattr(vocab, name):
+            ids.extend(related)
+            offsets.append(len(ids))
+        sections.extend((offsets.tobytes(), ids.tobytes()))
+
+    table = []
+    position = HEADER.size
+    for data in sections:
+        position += -position % 8
+        table.extend((position, len(data)))
+        position += len(data)
+    f.write(HEADER.pack(MAGIC, FORMAT, BYTE_ORDER_MARK,
+        len(vocab.uris), len(strings), *table))
+    position = HEADER.size
+    for data in sections:
+        f.write(b"\0" * (-position % 8))
+        position += -position % 8
+        f.write(data)
+        position += len(data)
+
+def load(path) -> Vocabulary:
+    """Open snapshot at path as a read-only, memory-mapped Vocabulary"""
+    return MappedVocabulary(path)
+
+
+class _Column:
+    """Sequence by term id read from the snapshot. Terms added
+    with Vocabulary.add() are kept in memory.
+
+    Subclasses define _get(i) and, inlining it as it is called
+    often, __getitem__(i)."""
+    __slots__ = ("_n", "_added")
+
+    def __init__(self, n):
+        self._n = n
+        self._added = []
+
+    def __len__(self):
+        return self._n + len(self._added)
+
+    def __iter__(self):
+        return itertools.chain(map(self._get, range(self._n)), self._added)
+
+    def append(self, value):
+        self._added.append(value)
+
+class _Strings(_Column):
+    __slots__ = ("_refs", "_offsets", "_data", "_decoded")
+
+    def __init__(self, n, refs, offsets, data):
+        super().__init__(n)
+        self._refs = refs
+        self._offsets = offsets
+        self._data = data
+        # Strings decoded so far, by term id, as labels and comments
+        # are read again for every profile using the term
+        self._decoded = [_UNDECODED] * n
+
+    def _get(self, i):
+        s = self._refs[i]
+        if s == NONE:
+            return None
+        return str(self._data[self._offsets[s]:self._offsets[s+1]], "utf-8")
+
+    def __getitem__(self, i):
+        if i >= self._n:
+            return self._added[i - self._n]
+        s = self._decoded[i]
+        if s is _UNDECODED:
+            s = self._decoded[i] = self._get(i)
+        return s
+
+class _Kinds(_Column):
+    __slots__ = ("_kinds",)
+
+    def __init__(self, n, kinds):
+        super().__init__(n)
+        self._kinds = kinds
+
+    def _get(self, i):
+        return self._kinds[i]
+
+    def __getitem__(self, i):
+        if i >= self._n:
+            return self._added[i - self._n]
+        return self._kinds[i]
+
+    def __iter__(self):
+        return itertools.chain(self._kinds, self._added)
+
+class _Related(_Column):
+    __slots__ = ("_offsets", "_ids")
+
+    def __init__(self, n, offsets, ids):
+        super().__init__(n)
+        self._offsets = offsets
+        self._ids = ids
+
+    def _get(self, i):
+        return tuple(self._ids[self._offsets[i]:self._offsets[i+1]])
+
+    def __getitem__(self, i):
+        if i >= self._n:
+            return self._added[i - self._n]
+        return tuple(self._ids[self._offsets[i]:self._offsets[i+1]])
+
+class _Ids:
+    """Mapping of URI to term id, by binary search of the sorted URIs"""
+    __slots__ = ("_uris", "_n", "_found")
+
+    def __init__(self, uris, n):
+        self._uris = uris
+        self._n = n
+        # Looked up and added URIs
+        self._found = {}
+
+    def get(self, uri, default=None):
+        i = self._found.get(uri)
+        if i is None:
+            i = bisect.bisect_left(_Sorted(self._uris), uri, 0, self._n)
+            if i == self._n or self._uris[i] != uri:
+                return default
+            self._found[uri] = i
+        return i
+
+    def __getitem__(self, uri):
+        i = self.get(uri)
+        if i is None:
+            raise KeyError(uri)
+        return i
+
+    def __setitem__(self, uri, i):
+        self._found[uri] = i
+
+    def __contains__(self, uri):
+        return self.get(uri) is not None
+
+class _Sorted:
+    # Sequence for bisect, as Python < 3.10 bisect has no key
+    __slots__ = ("_uris",)
+
+    def __init__(self, uris):
+        self._uris = uris
+
+    def __getitem__(self, i):
+        return self._uris._get(i)
+
+    def __len__(self):
+        return self._uris._n
+
+
+class MappedVocabulary(Vocabulary):
+    """Vocabulary with its columns read from a memory-mapped snapshot.
+
+    URIs, labels and comments are decoded when accessed; use the
+    SchemaType views, which keep their uri.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError("Truncated vocabulary snapshot %s" % path)
+        (magic, format, mark, nTerms, nStrings, *table) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or format != FORMAT or mark != BYTE_ORDER_MARK:
+            raise ValueError("Not a vocabulary snapshot of format %s: %s" % (FORMAT, path))
+        view = memoryview(self._mmap)
+        sections = {}
+        for (name, offset, length) in zip(SECTIONS, table[0::2], table[1::2]):
+            if offset + length > len(self._mmap):
+                raise ValueError("Truncated vocabulary snapshot %s" % path)
+            sections[name] = view[offset:offset+length]
+        uint32 = lambda name: sections[name].cast("I")
+        terms = uint32("terms")
+        strings = (uint32("string_offsets"), sections["string_data"])
+        self.version = str(sections["version"], "utf-8")
+        self.uris = _Strings(nTerms, terms[URI::RECORD_SIZE], *strings)
+        self.ids = _Ids(self.uris, nTerms)
+        self.kinds = _Kinds(nTerms, terms[KIND::RECORD_SIZE])
+        self.labels = _Strings(nTerms, terms[LABEL::RECORD_SIZE], *strings)
+        self.comments = _Strings(nTerms, terms[COMMENT::RECORD_SIZE], *strings)
+        for name in Vocabulary.RELATIONS:
+            setattr(self, name, _Related(nTerms,
+                uint32(name + "_offsets"), uint32(name + "_ids")))
+
+    def __getstate__(self):
+        # Other processes map the same file
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Per-phase timings and counters of profile generation
+
+Disabled by default, so the instrumented code only pays for a flag check.
+
+    timings.enable()
+    with timings.phase("download"):
+        ...
+    timings.count("rdflib_queries")
+    print(timings.report())
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import sys
+import math
+import time
+import random
+import threading
+from collections import OrderedDict
+
+enabled = False
+
+# Samples kept per phase for percentiles, so long-running processes
+# like the profile server use bounded memory
+RESERVOIR_SIZE = 1024
+
+_lock = threading.Lock()
+_phases = OrderedDict() # phase name -> _Stats
+_counters = OrderedDict() # counter name -> int
+
+class _Stats:
+    """Running count, total, min and max of a phase, with a uniform
+    random sample of at most RESERVOIR_SIZE of its timings"""
+    __slots__ = ("count", "total", "min", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(seconds)
+        else:
+            # Reservoir sampling, keeping each timing with equal probability
+            i = random.randrange(self.count)
+            if i < RESERVOIR_SIZE:
+                self.samples[i] = seconds
+
+    def merge(self, other):
+        if not other.count:
+            return
+        samples = self.samples + other.samples
+        if len(samples) > RESERVOIR_SIZE:
+            # In proportion to the timings each sample stands for
+            mine = round(RESERVOIR_SIZE * self.count / (self.count + other.count))
+            mine = max(RESERVOIR_SIZE - len(other.samples), min(mine, len(self.samples)))
+            samples = (random.sample(self.samples, mine) +
+                random.sample(other.samples, RESERVOIR_SIZE - mine))
+        self.samples = samples
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def state(self):
+        return {"count": self.count, "total": self.total, "min": self.min,
+            "max": self.max, "samples": list(self.samples)}
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        for (name, value) in state.items():
+            setattr(stats, name, value)
+        return stats
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+def reset():
+    with _lock:
+        _phases.clear()
+        _counters.clear()
+
+def record(name, seconds):
+    """Add a timing sample of phase name"""
+    with _lock:
+        stats = _phases.get(name)
+        if stats is None:
+            stats = _phases[name] = _Stats()
+        stats.add(seconds)
+
+def count(name, n=1):
+    """Increase counter name by n"""
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_PHASE = _NoPhase()
+
+def phase(name):
+    """Context manager timing the enclosed block as a sample of phase name.
+
+    Phases may nest, e.g. "yaml_dump" within "profile", so their
+    totals overlap.
+    """
+    if enabled:
+        return _Phase(name)
+    return _NO_PHASE
+
+def snapshot(reset=False):
+    """Statistics of phases and counters, e.g. to send from a worker
+    process to merge()"""
+    with _lock:
+        snap = {"phases": {k: v.state() for (k, v) in _phases.items()},
+            "counters": dict(_counters)}
+        if reset:
+            _phases.clear()
+            _counters.clear()
+    return snap
+
+def merge(snap):
+    """Add phases and counters from snapshot() of another process"""
+    with _lock:
+        for (name, state) in snap["phases"].items():
+            stats = _phases.get(name)
+            if stats is None:
+                stats = _phases[name] = _Stats()
+            stats.merge(_Stats.from_state(state))
+        for (name, n) in snap["counters"].items():
+            _counters[name] = _counters.get(name, 0) + n
+
+def _percentile(ordered, p):
+    # nearest-rank
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def report():
+    """Summary of phases (count, total, min, max, and p50, p95 of
+    sampled timings, in seconds) and counters"""
+    snap = snapshot()
+    phases = OrderedDict()
+    for (name, stats) in snap["phases"].items():
+        ordered = sorted(stats["samples"])
+        phases[name] = OrderedDict([("count", stats["count"]),
+            ("total", stats["total"]),
+            ("min", stats["min"]),
+            ("max", stats["max"]),
+            ("p50", _percentile(ordered, 50)),
+            ("p95", _percentile(ordered, 95))])
+    return OrderedDict([("phases", phases), ("counters", snap["counters"])])
+
+def print_report(out=sys.stderr):
+    r = report()
+    out.write("%-20s %8s %11s %10s %10s %10s\n" %
+        ("phase", "count", "total ms", "p50 ms", "p95 ms", "max ms"))
+    for (name, p) in r["phases"].items():
+        out.write("%-20s %8d %11.2f %10.3f %10.3f %10.3f\n" % (name, p["count"],
+            p["total"]*1000, p["p50"]*1000, p["p95"]*1000, p["max"]*1000))
+    for (name, n) in r["counters"].items():
+        out.write("%-20s %8d\n" % (name, n))
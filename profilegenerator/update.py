@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Update existing profiles, keeping the fields filled in by curators
+
+The YAML front-matter of the existing profile is parsed and its mapping
+entries are keyed by property. Only entries whose schema.org terms
+changed since the profile's schema_version are rendered again, and
+merged so that curated values (bsc_description, marginality, ..) are
+kept. Other entries keep their exact text, and a profile where nothing
+changed is not written at all.
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import logging
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
+
+from . import schemaorg
+from . import cache
+from . import diff
+from .schemaorg import SchemaContext
+from .vocabulary import SCHEMA_URL
+from .profileTemplate import profileType, versionDateNow
+from .main import (streamProfile, mappingEntry, dumpMappingEntry,
+    read_front_matter, _dumpYaml, _yaml)
+
+_logger = logging.getLogger(__name__)
+
+# Mapping entry fields kept when the profile's earlier schema.org version
+# is not available to compare with: those not rendered from schema.org,
+# and examples which curators usually rewrite
+CURATED_FIELDS = frozenset(("type", "type_url", "bsc_description",
+    "equivalentProperty", "marginality", "cardinality", "controlled_vocab",
+    "example"))
+
+# schema_version of profiles generated from "latest", which does not
+# tell which release that was
+LATEST_VERSIONS = frozenset(("latest", SCHEMA_URL.substitute(version="latest")))
+
+MappingItem = namedtuple("MappingItem", "name entry text")
+MappingItem.__doc__ = """Entry of an existing profile's mapping, with
+name of its property (None if it has none) and its YAML text"""
+
+ExistingProfile = namedtuple("ExistingProfile", "header spans items around footer")
+ExistingProfile.__doc__ = """Parsed profile, see read_profile()"""
+
+def read_profile(filename) -> ExistingProfile:
+    """Parse the YAML front-matter of the profile in filename.
+
+    Returns ExistingProfile where header is the front-matter, spans
+    its text by top-level key, items the list of MappingItem of its
+    mapping, around the text of the mapping before and after the
+    items (None unless these are a non-empty block sequence) and footer
+    the text after the front-matter; or None if there is no such file.
+    """
+    if filename == "-" or not os.path.exists(filename):
+        return None
+    found = read_front_matter(filename)
+    if found is None:
+        raise ValueError("No YAML front-matter in %s" % filename)
+    (front, footer) = found
+    yaml = _yaml()
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)(front)
+    try:
+        node = loader.get_single_node()
+        header = node and loader.construct_document(node)
+    except yaml.YAMLError as e:
+        raise ValueError("Invalid YAML front-matter in %s: %s" % (filename, e))
+    finally:
+        loader.dispose()
+    if not isinstance(header, dict):
+        raise ValueError("Invalid YAML front-matter in %s" % filename)
+    lineStart = lambda mark: front.rfind("\n", 0, mark.index) + 1
+    # Text of a key is from the start of its line to the next key,
+    # the first also includes any comments before it
+    starts = [0] + [lineStart(k.start_mark) for (k, v) in node.value[1:]]
+    ends = starts[1:] + [len(front)]
+    spans = OrderedDict()
+    (items, around) = ([], None)
+    for ((k, v), start, end) in zip(node.value, starts, ends):
+        spans[k.value] = front[start:end]
+        if k.value != "mapping" or not header["mapping"]:
+            continue
+        entries = header["mapping"]
+        if v.id != "sequence" or v.flow_style:
+            items = [MappingItem(_name(e), e, dumpMappingEntry(e)) for e in entries]
+            continue
+        itemStarts = [lineStart(n.start_mark) for n in v.value]
+        last = v.value[-1].end_mark
+        itemsEnd = last.index
+        if last.column:
+            itemsEnd = front.find("\n", itemsEnd) + 1 or len(front)
+        for (entry, itemStart, itemEnd) in zip(entries, itemStarts, itemStarts[1:] + [itemsEnd]):
+            items.append(MappingItem(_name(entry), entry, front[itemStart:itemEnd]))
+        around = (front[start:itemStarts[0]], front[itemsEnd:end])
+    return ExistingProfile(header, spans, items, around, footer)
+
+def _name(entry):
+    return isinstance(entry, dict) and entry.get("property") or None
+
+def merge_entry(existing, fresh, base=None):
+    """Merge the fresh rendering of a mapping entry into the existing entry.
+
+    Values the curator changed from base, the entry as rendered from the
+    profile's earlier schema.org version, are kept. Without base the
+    values of CURATED_FIELDS are kept. Fields that are not rendered are
+    always kept.
+    """
+    merged = dict(fresh)
+    for (key, value) in existing.items():
+        if base is None:
+            curated = key in CURATED_FIELDS
+        else:
+            curated = value != base.get(key)
+        if key not in fresh or curated:
+            merged[key] = value
+    return merged
+
+def previous_context(version, context: SchemaContext):
+    """SchemaContext of the schema.org version a profile was based on,
+    if loaded or cached, otherwise None. Also None for LATEST_VERSIONS,
+    as "latest" may have been another release then."""
+    if not version or version in LATEST_VERSIONS:
+        return None
+    if version == context.version:
+        return context
+    for c in schemaorg.loaded_contexts().values():
+        if c.version == version:
+            return c
+    for meta in cache.entries():
+        if meta["version"] == version:
+            try:
+                return schemaorg.get_context(meta["schemaver"], offline=True)
+            except (OSError, ValueError) as e:
+                _logger.warning("Could not load cached schema.org %s: %s" %
+                    (meta["schemaver"], e))
+    return None
+
+@lru_cache(maxsize=4)
+def _term_changes(old: SchemaContext, new: SchemaContext):
+    return diff.term_changes(old.vocabulary, new.vocabulary)
+
+def _properties(schematype, context):
+    """Properties of the profile of schematype by name, in mapping order"""
+    return OrderedDict((str(p), p) for props in
+        schemaorg.find_properties(schematype, context).values() for p in props)
+
+def updateProfile(schematype, filename, profileName=None, groupName=None, description=None, versionDate=None, context=None):
+    """Update the existing profile of schematype in filename.
+
+    Returns the updated profile as an iterator of strings, or None if
+    nothing changed. If filename does not exist the profile is rendered
+    as by streamProfile(). If the schema.org version of the profile is
+    unknown, i.e. neither loaded nor cached or "latest", only the entries
+    it has are rendered again, keeping CURATED_FIELDS. Properties can then
+    not be told apart from those a curator added or deleted, so they are
+    logged rather than added or removed.
+    """
+    existing = read_profile(filename)
+    if existing is None:
+        return streamProfile(schematype, profileName, groupName, description,
+            versionDate=versionDate, context=context)
+    context = context or schemaorg.default_context()
+    typ = schemaorg.find_class(schematype, context)
+    header = dict(existing.header)
+    props = _properties(schematype, context)
+    # Entries to render again, with their rendering from the previous version
+    recompute = OrderedDict()
+    (added, removed) = ((), ())
+    hierarchy = False
+    previous = previous_context(header.get("schema_version"), context)
+    if previous is None:
+        _logger.warning("schema.org release %s of %s is not available, only refreshing its entries" %
+            (header.get("schema_version"), filename))
+        names = [item.name for item in existing.items if item.name]
+        recompute = OrderedDict.fromkeys(name for name in names if name in props)
+        unknown = sorted(set(props).symmetric_difference(names))
+        if unknown:
+            _logger.warning("Not added or removed from %s, as it is unknown if schema.org "
+                "or a curator changed them: %s" % (filename, " ".join(unknown)))
+        hierarchy = True
+    elif previous is not context:
+        delta = diff.profile_delta(schematype, previous, context,
+            _term_changes(previous, context))
+        if delta:
+            recompute = OrderedDict.fromkeys(delta.added)
+            added = delta.added
+            if delta.changed:
+                oldTyp = schemaorg.find_class(schematype, previous)
+                oldProps = _properties(schematype, previous)
+                for name in delta.changed:
+                    recompute[name] = mappingEntry(oldTyp, oldProps[name])
+            removed = delta.removed
+            hierarchy = delta.hierarchy
+    if not (recompute or removed or hierarchy):
+        _logger.info("Unchanged %s" % filename)
+        return None
+
+    changed = False
+    if hierarchy:
+        superclasses = profileType(list(reversed(typ.ancestors)))
+        if header.get("hierarchy") != superclasses:
+            header["hierarchy"] = superclasses
+            changed = True
+    indent = ""
+    if existing.items:
+        first = existing.items[0].text
+        indent = first[:len(first) - len(first.lstrip(" "))]
+    items = []
+    for item in existing.items:
+        if item.name in removed:
+            _logger.info("Removing %s from %s" % (item.name, filename))
+            changed = True
+            continue
+        if item.name in recompute and item.name in props and isinstance(item.entry, dict):
+            merged = merge_entry(item.entry, mappingEntry(typ, props[item.name]),
+                recompute[item.name])
+            if merged != item.entry:
+                item = MappingItem(item.name, merged,
+                    _indent(dumpMappingEntry(merged), indent))
+                changed = True
+        items.append(item)
+    # Added properties go after the property preceding them in the mapping,
+    # unless the curator already added them
+    names = set(item.name for item in items)
+    preceding = set()
+    for name in props:
+        if name in added and name not in names:
+            at = 0
+            for (i, item) in enumerate(items):
+                if item.name in preceding:
+                    at = i + 1
+            entry = mappingEntry(typ, props[name])
+            items.insert(at, MappingItem(name, entry, _indent(dumpMappingEntry(entry), indent)))
+            changed = True
+        preceding.add(name)
+    if not changed:
+        _logger.info("Unchanged %s" % filename)
+        return None
+
+    header["schema_version"] = schemaorg.get_version(context)
+    header["version_date"] = versionDate or versionDateNow()
+    header["mapping"] = [item.entry for item in items]
+    return _streamUpdate(existing, header, items)
+
+def _indent(text, indent):
+    if not indent:
+        return text
+    return "".join(indent + line for line in text.splitlines(True))
+
+def _streamUpdate(existing, header, items):
+    """Front-matter with the text of unchanged keys and mapping items kept"""
+    yield "---\n"
+    for (key, value) in header.items():
+        if key == "mapping":
+            if not items:
+                yield _dumpYaml({key: []})
+                continue
+            (before, after) = existing.around or ("mapping:\n", "")
+            yield before
+            yield from (item.text for item in items)
+            yield after
+        elif key in existing.spans and value == existing.header[key]:
+            yield existing.spans[key]
+        else:
+            yield _dumpYaml({key: value})
+    yield "---\n"
+    yield existing.footer
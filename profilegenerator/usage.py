@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Find which schema.org types and profiles use a property
+
+The mapping of each profile in a directory is indexed by property, with
+the marginality the profile gives it, and kept in INDEX_FILE in that
+directory. The index is brought up to date on every query by reading
+only the profiles added or modified since, so looking up a property is
+a dictionary lookup even for a large directory of profiles.
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import sys
+import json
+import logging
+import argparse
+import tempfile
+from collections import namedtuple
+
+from . import schemaorg
+from . import timings
+from .schemaorg import SchemaContext, SchemaClass, SCHEMA
+from .main import Status, _setup, _add_common_arguments, read_header
+
+_logger = logging.getLogger(__name__)
+
+INDEX_FILE = ".profile-index.json"
+# Bump when the layout of INDEX_FILE changes
+INDEX_FORMAT = 1
+
+ProfileUse = namedtuple("ProfileUse", "filename schematype marginality")
+ProfileUse.__doc__ = """Mapping entry of a property in a profile"""
+
+PropertyUsage = namedtuple("PropertyUsage", "property domain range types profiles")
+PropertyUsage.__doc__ = """Where a property is used, see property_usage()"""
+
+class ProfileIndex:
+    """Inverted index of the profiles in a directory, by property.
+
+    Each profile is recorded with its size and modification time, so
+    refresh() only reads the profiles that changed since the index was
+    saved.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILE)
+        # filename -> {"mtime", "size", "type", "properties": [property]}
+        self.profiles = {}
+        # property -> {filename: marginality}
+        self.properties = {}
+        self.modified = False
+
+    @classmethod
+    def load(cls, directory):
+        """Index of directory as last saved, empty if none or outdated"""
+        index = cls(directory)
+        try:
+            with open(index.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return index
+        except ValueError as e:
+            _logger.warning("Ignoring corrupt profile index %s: %s" % (index.path, e))
+            return index
+        if saved.get("format") != INDEX_FORMAT:
+            _logger.info("Ignoring profile index %s in old format %s" %
+                (index.path, saved.get("format")))
+            return index
+        index.profiles = saved["profiles"]
+        index.properties = saved["properties"]
+        return index
+
+    def save(self):
+        """Write the index if modified, replacing the earlier one"""
+        if not self.modified:
+            return
+        # Unique, so concurrent queries do not write to the same file
+        (fd, tmp) = tempfile.mkstemp(dir=self.directory,
+            prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                json.dump({"format": INDEX_FORMAT, "profiles": self.profiles,
+                    "properties": self.properties}, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.modified = False
+
+    def refresh(self):
+        """Index profiles added or modified in the directory since last
+        refreshed, and drop removed profiles. Returns number of profiles
+        read or dropped."""
+        found = {}
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".html") and entry.is_file():
+                    found[entry.name] = entry.stat()
+        changed = 0
+        for name in list(self.profiles):
+            if name not in found:
+                self._remove(name)
+                changed += 1
+        for (name, stat) in sorted(found.items()):
+            known = self.profiles.get(name)
+            if known and known["mtime"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+                continue
+            if known:
+                self._remove(name)
+            self._add(name, stat)
+            changed += 1
+        return changed
+
+    def _remove(self, name):
+        for prop in self.profiles.pop(name)["properties"]:
+            uses = self.properties[prop]
+            del uses[name]
+            if not uses:
+                del self.properties[prop]
+        self.modified = True
+
+    def _add(self, name, stat):
+        with timings.phase("index profile"):
+            try:
+                header = read_header(os.path.join(self.directory, name))
+            except ValueError as e:
+                _logger.warning("Skipping profile: %s" % e)
+                header = None
+        mapping = {}
+        schematype = None
+        if header:
+            schematype = header.get("official_type")
+            for entry in header.get("mapping") or ():
+                if isinstance(entry, dict) and entry.get("property"):
+                    mapping[str(entry["property"])] = entry.get("marginality")
+        self.profiles[name] = {"mtime": stat.st_mtime_ns, "size": stat.st_size,
+            "type": schematype, "properties": list(mapping)}
+        for (prop, marginality) in mapping.items():
+            self.properties.setdefault(prop, {})[name] = marginality
+        self.modified = True
+
+    def lookup(self, prop) -> list:
+        """ProfileUse of each profile mapping prop, by filename"""
+        uses = self.properties.get(prop, {})
+        return [ProfileUse(name, self.profiles[name]["type"], marginality)
+            for (name, marginality) in sorted(uses.items())]
+
+def profile_index(directory) -> ProfileIndex:
+    """Index of the profiles in directory, brought up to date and saved"""
+    index = ProfileIndex.load(directory)
+    changed = index.refresh()
+    if changed:
+        _logger.info("Indexed %d changed profiles in %s" % (changed, directory))
+    try:
+        index.save()
+    except OSError as e:
+        # e.g. a read-only directory, the index is then only kept in memory
+        _logger.warning("Could not save profile index %s: %s" % (index.path, e))
+    return index
+
+def property_usage(name, index: ProfileIndex=None, context: SchemaContext=None) -> PropertyUsage:
+    """Where property name is used.
+
+    Returns PropertyUsage with its schema.org domain and range classes,
+    types as the domain classes and their subclasses, i.e. the classes
+    whose profiles include the property, and profiles as the list of
+    ProfileUse of index. domain, range and types are empty if name is not
+    a schema.org property.
+    """
+    context = context or schemaorg.default_context()
+    vocab = context.vocabulary
+    uri = name if name.startswith(SCHEMA) else SCHEMA[name]
+    (domain, range_, types) = ((), (), ())
+    i = vocab.ids.get(uri)
+    if i is not None and vocab.kinds[i] & vocab.PROPERTY:
+        domain = vocab.get("domainIncludes", uri)
+        range_ = vocab.get("rangeIncludes", uri)
+        reach = context.reachability
+        mask = 0
+        for d in vocab.domainIncludes[i]:
+            mask |= reach.descendants(d)
+        classes = [vocab.uris[c] for c in reach.ids(mask) if vocab.kinds[c] & vocab.CLASS]
+        types = tuple(str(c) for c in context.as_types(SchemaClass, classes))
+        domain = tuple(str(c) for c in context.as_types(SchemaClass, domain))
+        range_ = tuple(str(c) for c in context.as_types(SchemaClass, range_))
+    profiles = index.lookup(uri[len(SCHEMA):]) if index else []
+    return PropertyUsage(uri[len(SCHEMA):], domain, range_, sorted(types), profiles)
+
+def printUsage(usage, listTypes=False, out=sys.stdout):
+    out.write("%s\n" % usage.property)
+    out.write("  domain: %s\n" % " ".join(usage.domain))
+    out.write("  range: %s\n" % " ".join(usage.range))
+    if listTypes:
+        out.write("  types (%d): %s\n" % (len(usage.types), " ".join(usage.types)))
+    else:
+        out.write("  types: %d\n" % len(usage.types))
+    out.write("  profiles (%d):\n" % len(usage.profiles))
+    for use in usage.profiles:
+        out.write("    %-30s %-12s %s\n" % (use.schematype, use.marginality, use.filename))
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(prog="bioschemas-profilegen usage",
+        description="Show the schema.org domain and range of properties, "
+            "and which types and profiles use them")
+    parser.add_argument("properties", metavar="PROPERTY", nargs="+",
+        help='schema.org property, e.g. "distribution"')
+    parser.add_argument("--output-dir", "-O", metavar="DIR", default=".",
+        help="Directory of profiles to index (default: current directory)")
+    parser.add_argument("--types", "-t", action="store_true",
+        help="List all types using each property, rather than their number")
+    _add_common_arguments(parser, output=False)
+    return parser.parse_args(args)
+
+def main(args=None):
+    """Show where properties are used"""
+    args = parse_args(args)
+    _setup(args)
+    index = profile_index(args.output_dir)
+    status = Status.OK
+    for prop in args.properties:
+        usage = property_usage(prop, index)
+        if not (usage.domain or usage.profiles):
+            _logger.error("Unknown property %s" % prop)
+            status = Status.TYPE_NOT_FOUND
+            continue
+        printUsage(usage, args.types)
+    return status
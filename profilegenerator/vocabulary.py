@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+In-memory index of the schema.org vocabulary
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+from string import Template
+from collections import OrderedDict
+import logging
+import json
+import sys
+
+from ._logging import LOG_TRACE
+from . import cache
+from . import fetch
+from . import timings
+
+_logger = logging.getLogger(__name__)
+
+# https://schema.org/docs/developers.html
+SCHEMA_URL=Template("https://schema.org/version/${version}/schemaorg-all-http.jsonld")
+
+
+class Namespace(str):
+    """Namespace of plain str URIs, e.g. SCHEMA.Thing or SCHEMA["Thing"]
+
+    Unlike rdflib.Namespace the terms are not URIRef, so they can be
+    used as keys in (and compared with) the Vocabulary index.
+    """
+    def term(self, name):
+        return str(self) + name
+
+    def __getitem__(self, name):
+        return self.term(name)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self.term(name)
+
+SCHEMA = Namespace("http://schema.org/")
+RDF = Namespace("http://www.w3.org/1999/02/22-rdf-syntax-ns#")
+RDFS = Namespace("http://www.w3.org/2000/01/rdf-schema#")
+
+
+class Vocabulary:
+    """Table of schema.org terms, indexed by integer id.
+
+    Built in a single pass over the schema.org declarations so that
+    lookups do not need to query (or keep) the rdflib store. Term URIs
+    are interned and numbered in sorted order; the other attributes are
+    columns by id, with related terms as tuples of ids.
+    Sequences are sorted to give deterministic output.
+    """
+    # Flags of kinds
+    CLASS = 1
+    PROPERTY = 2
+
+    # Columns of related terms
+    RELATIONS = ("supertypes", "domainIncludes", "rangeIncludes",
+        "includedInDomainOf", "includedInRangeOf")
+
+    def __init__(self, version):
+        self.version = version
+        self.uris = []
+        # uri -> id, rebuilt rather than pickled
+        self.ids = {}
+        # id -> CLASS | PROPERTY, or 0 for terms only labelled or referenced
+        self.kinds = bytearray()
+        self.labels = []
+        self.comments = []
+        # id -> tuple of rdfs:subClassOf or rdfs:subPropertyOf
+        self.supertypes = []
+        # property -> tuple of classes
+        self.domainIncludes = []
+        self.rangeIncludes = []
+        # class -> tuple of properties
+        self.includedInDomainOf = []
+        self.includedInRangeOf = []
+
+    def __repr__(self):
+        return "<Vocabulary schema.org %s: %d classes, %d properties>" % (
+            self.version, len(self.terms(self.CLASS)), len(self.terms(self.PROPERTY)))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["ids"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.uris = [sys.intern(uri) for uri in self.uris]
+        self.ids = {uri: i for (i, uri) in enumerate(self.uris)}
+
+    @property
+    def classes(self):
+        """URIs of rdfs:Class terms"""
+        return frozenset(self.uris[i] for i in self.terms(self.CLASS))
+
+    @property
+    def properties(self):
+        """URIs of rdf:Property terms"""
+        return frozenset(self.uris[i] for i in self.terms(self.PROPERTY))
+
+    def terms(self, kind):
+        """Ids of terms of kind (CLASS or PROPERTY), in URI order"""
+        return [i for (i, k) in enumerate(self.kinds) if k & kind]
+
+    def kind(self, uri):
+        """CLASS and/or PROPERTY flags of uri, 0 if neither"""
+        i = self.ids.get(uri)
+        return i is not None and self.kinds[i] or 0
+
+    def get(self, name, uri):
+        """Column name of uri, with related terms as URIs, or None if unknown"""
+        i = self.ids.get(uri)
+        if i is None:
+            return None
+        value = getattr(self, name)[i]
+        if name in self.RELATIONS:
+            return tuple(self.uris[o] for o in value)
+        return value
+
+    def add(self, uri):
+        """Add an undeclared term, e.g. a non-schema.org type, returning its id"""
+        i = self.ids.get(uri)
+        if i is None:
+            i = self.ids[uri] = len(self.uris)
+            self.uris.append(sys.intern(uri))
+            self.kinds.append(0)
+            self.labels.append(None)
+            self.comments.append(None)
+            for name in self.RELATIONS:
+                getattr(self, name).append(())
+        return i
+
+    @classmethod
+    def from_triples(cls, triples, version):
+        """Build index from (s, p, o) triples of the schema.org declarations"""
+        # Namespace terms are built on each access, so look them up once
+        (rdfType, label, comment) = (RDF.type, RDFS.label, RDFS.comment)
+        kindOf = {RDFS.Class: cls.CLASS, RDF.Property: cls.PROPERTY}
+        columnOf = {RDFS.subClassOf: "supertypes", RDFS.subPropertyOf: "supertypes",
+            SCHEMA.domainIncludes: "domainIncludes", SCHEMA.rangeIncludes: "rangeIncludes"}
+        uris = set()
+        kinds = {}
+        labels = {}
+        comments = {}
+        related = {name: {} for name in columnOf.values()}
+        for (s, p, o) in triples:
+            s, p, o = str(s), str(p), str(o)
+            if p == rdfType:
+                if o not in kindOf:
+                    continue
+                kinds[s] = kinds.get(s, 0) | kindOf[o]
+            elif p == label:
+                labels.setdefault(s, o) # usually only one!
+            elif p == comment:
+                comments.setdefault(s, o)
+            elif p in columnOf:
+                related[columnOf[p]].setdefault(s, set()).add(o)
+                uris.add(o)
+            else:
+                continue
+            uris.add(s)
+
+        vocab = cls(version)
+        # Numbered in URI order, so sorted ids are sorted URIs
+        vocab.uris = [sys.intern(uri) for uri in sorted(uris)]
+        vocab.ids = ids = {uri: i for (i, uri) in enumerate(vocab.uris)}
+        vocab.kinds = bytearray(kinds.get(uri, 0) for uri in vocab.uris)
+        vocab.labels = [labels.get(uri) for uri in vocab.uris]
+        vocab.comments = [comments.get(uri) for uri in vocab.uris]
+        for (name, mapping) in related.items():
+            setattr(vocab, name, [uri in mapping and
+                tuple(sorted(ids[o] for o in mapping[uri])) or ()
+                for uri in vocab.uris])
+        vocab.includedInDomainOf = vocab._reverse(vocab.domainIncludes)
+        vocab.includedInRangeOf = vocab._reverse(vocab.rangeIncludes)
+        return vocab
+
+    def _reverse(self, column):
+        reverse = {}
+        for (prop, classes) in enumerate(column):
+            for c in classes:
+                reverse.setdefault(c, []).append(prop)
+        # Sorted like str(SchemaProperty)
+        key = lambda p: self.labels[p] or self.uris[p]
+        return [i in reverse and tuple(sorted(reverse[i], key=key)) or ()
+            for i in range(len(self.uris))]
+
+
+def parse_dataset(content: bytes, url):
+    """Parse schema.org JSON-LD as rdflib.Dataset"""
+    import rdflib # only needed on cache miss
+    _logger.info("Loading %s as RDF Dataset" % url)
+    d = rdflib.Dataset()
+    with timings.phase("parse_jsonld"):
+        d.parse(data=content.decode("utf-8"), format="json-ld", publicID=url)
+    _logger.info("Loaded %s quads" % len(d))
+    if _logger.isEnabledFor(LOG_TRACE):
+        _logger.log(LOG_TRACE, d.serialize(format="trig").decode("utf-8"))
+    return d
+
+def find_graph(dataset, url=None):
+    """Find the named graph of schema.org declarations in dataset, 
+    returning (graph, version)"""
+    import rdflib
+    thing = rdflib.URIRef(SCHEMA.Thing)
+    timings.count("rdflib_queries")
+    with timings.phase("find_graph"):
+        for (s,p,o,g) in dataset.quads([thing, rdflib.RDF.type, rdflib.RDFS.Class, None]):
+            # Found the named graph of schema.org declarations
+            graph = dataset.graph(g)
+            break
+        else:
+            raise ValueError("No schema.org declarations found in %s" % url)
+    version = str(graph.identifier).replace("http://schema.org/#", "")
+    return (graph, version)
+
+# Predicates used by Vocabulary.from_triples()
+INDEXED_PREDICATES = (RDF.type, RDFS.label, RDFS.comment, 
+    RDFS.subClassOf, RDFS.subPropertyOf, 
+    SCHEMA.domainIncludes, SCHEMA.rangeIncludes)
+
+def declarations(graph):
+    """Triples of graph with INDEXED_PREDICATES, as plain str"""
+    import rdflib
+    for p in INDEXED_PREDICATES:
+        timings.count("rdflib_queries")
+        for (s, _, o) in graph.triples((None, rdflib.URIRef(p), None)):
+            yield (str(s), p, str(o))
+
+class UnsupportedRelease(ValueError):
+    """JSON-LD is not shaped like a schema.org release, use the rdflib parser"""
+
+def _expand(term, prefixes):
+    # Compact IRI like "schema:Thing", or absolute IRI
+    (prefix, colon, rest) = term.partition(":")
+    if not colon or prefix == "_":
+        raise UnsupportedRelease("Relative IRI or blank node %r" % term)
+    if prefix in prefixes:
+        return prefixes[prefix] + rest
+    return term
+
+def _objects(value, prefixes, isType=False):
+    # Yield plain str objects of a node property, or None for non-string literals
+    for v in (value if isinstance(value, list) else (value,)):
+        if isinstance(v, str):
+            yield _expand(v, prefixes) if isType else v
+        elif isinstance(v, dict) and not isType and len(v) == 1 and isinstance(v.get("@id"), str):
+            yield _expand(v["@id"], prefixes)
+        elif (isinstance(v, dict) and not isType and isinstance(v.get("@value"), str) and
+                v.keys() <= {"@value", "@language", "@type"}):
+            yield v["@value"]
+        elif isinstance(v, (bool, int, float)) and not isType:
+            yield None
+        else:
+            # e.g. nested node, @list or null
+            raise UnsupportedRelease("Unsupported value %r" % (v,))
+
+def release_declarations(content: bytes, url):
+    """Read triples with INDEXED_PREDICATES from a schema.org release
+    directly, returning (triples, version) like declarations() and
+    find_graph().
+
+    Releases are a single @graph of flat term definitions with prefixes
+    as @context, so no JSON-LD expansion is needed. Raises
+    UnsupportedRelease for any other JSON-LD.
+    """
+    with timings.phase("read_release"):
+        doc = json.loads(content.decode("utf-8"))
+        if not (isinstance(doc, dict) and doc.keys() <= {"@context", "@graph", "@id"}
+                and isinstance(doc.get("@graph"), list)):
+            raise UnsupportedRelease("Not a single @graph")
+        prefixes = doc.get("@context", {})
+        if not (isinstance(prefixes, dict) and all(isinstance(v, str) and 
+                not k.startswith("@") for (k, v) in prefixes.items())):
+            raise UnsupportedRelease("@context is not only prefixes")
+        indexed = frozenset(INDEXED_PREDICATES)
+        rdfType = RDF.type
+        triples = []
+        for node in doc["@graph"]:
+            if not (isinstance(node, dict) and isinstance(node.get("@id"), str)):
+                raise UnsupportedRelease("Node without @id")
+            s = _expand(node["@id"], prefixes)
+            for (key, value) in node.items():
+                if key == "@id":
+                    continue
+                elif key == "@type":
+                    p = rdfType
+                elif key.startswith("@"):
+                    raise UnsupportedRelease("Unsupported keyword %s" % key)
+                else:
+                    p = _expand(key, prefixes)
+                for o in _objects(value, prefixes, p == rdfType):
+                    if p in indexed:
+                        if o is None:
+                            raise UnsupportedRelease("Non-string %s of %s" % (key, s))
+                        triples.append((s, p, o))
+        if (SCHEMA.Thing, rdfType, RDFS.Class) not in set(triples):
+            raise UnsupportedRelease("No schema.org declarations")
+        # Like rdflib, the graph is named by its @id or else the URL
+        graph = "@id" in doc and _expand(doc["@id"], prefixes) or url
+    return (triples, graph.replace("http://schema.org/#", ""))
+
+def parse(content: bytes, url, direct=True):
+    """Parse schema.org JSON-LD and index its named graph of declarations.
+
+    Releases are read directly unless direct is False, and any other
+    JSON-LD is parsed with rdflib.
+    """
+    triples = None
+    if direct:
+        try:
+            (triples, version) = release_declarations(content, url)
+        except UnsupportedRelease as e:
+            _logger.info("Parsing %s with rdflib: %s" % (url, e))
+    if triples is None:
+        (graph, version) = find_graph(parse_dataset(content, url), url)
+        triples = declarations(graph)
+    with timings.phase("index"):
+        vocab = Vocabulary.from_triples(triples, version)
+    _logger.info("Indexed %r" % vocab)
+    return vocab
+
+def _index(schemaver, download):
+    """Parse and cache the Download of schemaver, or load the cached
+    index if not modified"""
+    if not download.modified:
+        _logger.info("Cached schema.org %s is up to date" % schemaver)
+        with timings.phase("cache_load"):
+            vocab = cache.load(schemaver)
+        if vocab is not None:
+            return vocab
+        # Corrupt or unreadable, so download it again without validators
+        download = fetch.download(download.url, cache.download_path(schemaver))
+    with open(download.path, "rb") as f:
+        content = f.read()
+    try:
+        vocab = parse(content, download.url)
+    except Exception:
+        # Download again next time rather than resume
+        fetch.discard(download.path)
+        raise
+    with timings.phase("cache_store"):
+        cache.store(schemaver, download.url, content, vocab,
+            download.etag, download.last_modified)
+    return vocab
+
+def load(schemaver="latest", offline=False, refresh=False) -> Vocabulary:
+    """Load schema.org vocabulary index from cache or by downloading"""
+    return load_all([schemaver], offline, refresh)[schemaver]
+
+def load_all(versions, offline=False, refresh=False):
+    """Load vocabulary index of several schema.org versions, by version.
+
+    Versions that are not cached are downloaded and parsed concurrently.
+    With refresh, cached versions are revalidated and only downloaded
+    again if changed.
+    """
+    vocabs = OrderedDict()
+    stale = OrderedDict() # url -> (schemaver, cache metadata)
+    for schemaver in OrderedDict.fromkeys(versions):
+        meta = cache.lookup(schemaver)
+        vocab = None
+        if meta and (offline or not refresh):
+            with timings.phase("cache_load"):
+                vocab = cache.load(schemaver)
+            if vocab is None:
+                # Corrupt or unreadable, so download it again
+                meta = None
+        if vocab is not None:
+            vocabs[schemaver] = vocab
+        elif offline:
+            raise cache.CacheMiss("schema.org %s is not cached in %s" %
+                (schemaver, cache.cache_dir()))
+        else:
+            vocabs[schemaver] = None
+            stale[SCHEMA_URL.substitute(version=schemaver)] = (schemaver, meta or {})
+    if stale:
+        jobs = [(url, cache.download_path(schemaver), meta.get("etag"), meta.get("last_modified"))
+            for (url, (schemaver, meta)) in stale.items()]
+        loaded = fetch.download_all(jobs, lambda d: _index(stale[d.url][0], d))
+        for ((schemaver, meta), vocab) in zip(stale.values(), loaded):
+            vocabs[schemaver] = vocab
+    return vocabs
@@ -61,7 +61,9 @@ setup(
     test_suite='test',
     entry_points={
         'console_scripts': ["bioschemas-profilegen=profilegenerator.main:main",
-                "schemaorg-example=profilegenerator.schemaorg:main"]
+                "schemaorg-example=profilegenerator.schemaorg:main",
+                "schemaorg-cache=profilegenerator.cache:main",
+                "bioschemas-profilegen-server=profilegenerator.server:main"]
     },
     classifiers=[
         'Operating System :: OS Independent',
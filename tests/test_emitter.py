@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Tests that profilegenerator.emitter writes the same YAML as PyYAML,
+against golden files in data/emitter: NAME.json is dumped as NAME.yaml
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import json
+
+import pytest
+
+from profilegenerator import emitter
+
+DATA = os.path.join(os.path.dirname(__file__), "data", "emitter")
+CASES = sorted(name[:-len(".json")] for name in os.listdir(DATA) if name.endswith(".json"))
+
+def _read(name, suffix):
+    with open(os.path.join(DATA, name + suffix), encoding="utf-8", newline="") as f:
+        return f.read()
+
+@pytest.mark.parametrize("name", CASES)
+def test_dump(name):
+    data = json.loads(_read(name, ".json"))
+    expected = _read(name, ".yaml")
+    assert emitter.dump(data) == expected
+    assert emitter.pyyaml_dump(data) == expected
+
+def test_dump_mapping_entries():
+    # As profiles are written, one mapping entry at a time
+    for entry in json.loads(_read("mapping", ".json")):
+        assert emitter.dump([entry]) == emitter.pyyaml_dump([entry])
+
+def test_shared():
+    # PyYAML writes anchors and aliases for repeated objects
+    types = ["Person", "Organization"]
+    data = [{"property": "author", "expected_types": types},
+        {"property": "creator", "expected_types": types}]
+    assert "&id001" in emitter.dump(data)
+    assert emitter.dump(data) == emitter.pyyaml_dump(data)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+# SPDX-License-Identifer: MIT
+# Copyright 2020 Heriot-Watt University, UK
+# Copyright 2020 The University of Manchester, UK
+#
+
+"""
+Tests of profilegenerator.fetch against a local HTTP server standing
+in for schema.org, so they run offline
+"""
+
+__author__ = "Bioschemas.org community"
+__copyright__ = """© 2020 Heriot-Watt University, UK
+© 2020 The University of Manchester, UK
+"""
+__license__ = "MIT" # https://spdx.org/licenses/MIT
+
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from profilegenerator import fetch
+
+CONTENT = json.dumps({"@graph": [{"@id": "schema:Thing"}] * 200}).encode("utf-8")
+ETAG = '"release-1"'
+LAST_MODIFIED = "Wed, 21 Oct 2020 07:28:00 GMT"
+
+class _Release(BaseHTTPRequestHandler):
+    """Serves CONTENT like schema.org does. The server's mode makes it
+    answer every Range request with 416 ("416"), or close the
+    connection after half of the content ("short")"""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if (self.headers.get("If-None-Match") == ETAG or
+                self.headers.get("If-Modified-Since") == LAST_MODIFIED):
+            self.send_response(304)
+            self.end_headers()
+            return
+        offset = 0
+        byteRange = self.headers.get("Range")
+        if byteRange and self.server.mode == "416":
+            self.send_response(416)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if byteRange and self.headers.get("If-Range") in (ETAG, LAST_MODIFIED):
+            offset = int(byteRange[len("bytes="):].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" %
+                (offset, len(CONTENT) - 1, len(CONTENT)))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/ld+json")
+        self.send_header("Content-Length", str(len(CONTENT) - offset))
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        if self.server.mode == "short":
+            self.wfile.write(CONTENT[offset:len(CONTENT) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(CONTENT[offset:])
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Release)
+    httpd.mode = None
+    httpd.requests = []
+    httpd.url = "http://127.0.0.1:%d/schemaorg-all-http.jsonld" % httpd.server_address[1]
+    thread = threading.Thread(target=httpd.serve_forever,
+        kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def _partial(server, path, size):
+    """Leave a partial download of size bytes in path, as if interrupted"""
+    with open(path, "wb") as f:
+        f.write(CONTENT[:size])
+    with open(path + fetch.PARTIAL_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump({"url": server.url, "etag": ETAG, "last_modified": LAST_MODIFIED}, f)
+
+def test_download(server, tmp_path):
+    path = str(tmp_path / "release.jsonld")
+    d = fetch.download(server.url, path)
+    assert d.modified
+    assert (d.path, d.etag, d.last_modified) == (path, ETAG, LAST_MODIFIED)
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+
+@pytest.mark.parametrize("validators", [
+    {"etag": ETAG},
+    {"last_modified": LAST_MODIFIED},
+])
+def test_not_modified(server, tmp_path, validators):
+    path = str(tmp_path / "release.jsonld")
+    d = fetch.download(server.url, path, **validators)
+    assert not d.modified
+    assert d.path is None
+    assert (d.etag, d.last_modified) == (validators.get("etag"), validators.get("last_modified"))
+    assert not os.path.exists(path)
+
+def test_resume(server, tmp_path):
+    path = str(tmp_path / "release.jsonld")
+    _partial(server, path, 1000)
+    d = fetch.download(server.url, path)
+    assert d.modified
+    assert server.requests[0]["Range"] == "bytes=1000-"
+    assert server.requests[0]["If-Range"] == ETAG
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+
+def test_resume_changed_release(server, tmp_path):
+    path = str(tmp_path / "release.jsonld")
+    _partial(server, path, 1000)
+    with open(path + fetch.PARTIAL_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump({"url": server.url, "etag": '"release-0"'}, f)
+    # If-Range does not match, so the server sends all of the new release
+    fetch.download(server.url, path)
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+
+def test_restart_on_416(server, tmp_path):
+    server.mode = "416"
+    path = str(tmp_path / "release.jsonld")
+    _partial(server, path, len(CONTENT))
+    d = fetch.download(server.url, path)
+    assert d.modified
+    assert [r.get("Range") for r in server.requests] == ["bytes=%d-" % len(CONTENT), None]
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+
+def test_short_read(server, tmp_path):
+    server.mode = "short"
+    path = str(tmp_path / "release.jsonld")
+    with pytest.raises(ConnectionError):
+        fetch.download(server.url, path)
+    # Kept to resume next time
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT[:len(CONTENT) // 2]
+    server.mode = None
+    fetch.download(server.url, path)
+    assert server.requests[-1]["Range"] == "bytes=%d-" % (len(CONTENT) // 2)
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT